@@ -0,0 +1,169 @@
+import os
+import time
+import logging
+import threading
+from app.config import AUTOTUNE_SECONDS, AUTOTUNE_SAMPLE_SECONDS, AUTOTUNE_CHUNK_SIZES
+from app.settings import read_settings, update_settings
+
+
+# Returns the mount point a path lives on. Paths that do not exist yet resolve through their nearest existing parent.
+def mount_point(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+# The PairLimiter class bounds how many files of one source/destination pair are copied at once.
+# Unlike a semaphore its limit can change while files are in flight; a lower limit takes effect as files finish.
+class PairLimiter:
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def resize(self, limit):
+        with self._condition:
+            self.limit = max(1, limit)
+            self._condition.notify_all()
+
+
+# The PairTuning class holds the chunk size and parallelism used between one source device and one set of
+# destination devices, and tunes them while the first seconds of a job run. Each candidate setting is
+# used for AUTOTUNE_SAMPLE_SECONDS and its throughput measured: first the chunk sizes at full parallelism,
+# then fewer files at once with the best chunk size. The fastest setting is kept for the rest of the job.
+# Pairs with saved settings start tuned.
+class PairTuning:
+    def __init__(self, key, chunk_size, concurrency, max_concurrency, saved=None,
+                 chunk_sizes=AUTOTUNE_CHUNK_SIZES, seconds=AUTOTUNE_SECONDS, sample_seconds=AUTOTUNE_SAMPLE_SECONDS):
+        self.key = key  # "source mount -> destination mounts", the name the settings are saved under
+        self.chunk_size = chunk_size  # Bytes read and written per chunk
+        self.concurrency = concurrency  # Files of this pair copied at once
+        self.rate = None  # Bytes per second measured with the chosen setting
+        self.tuned = False  # True once the setting is fixed for the rest of the job
+        if saved:
+            self.chunk_size = saved["chunk_size"]
+            self.concurrency = min(max_concurrency, saved["concurrency"])
+            self.rate = saved.get("bytes_per_second")
+            self.tuned = True
+        self.limiter = PairLimiter(self.concurrency)
+        self.measured = False  # True if this job tuned the pair, so its result should be saved
+        self._max_concurrency = max_concurrency
+        self._seconds = seconds
+        self._sample_seconds = sample_seconds
+        self._trials = [(size, max_concurrency) for size in chunk_sizes]  # Settings still to try, in order
+        self._results = {}  # (chunk size, concurrency) -> bytes per second
+        self._started = None
+        self._window_start = None
+        self._window_bytes = 0
+        self._lock = threading.Lock()
+        if not self.tuned:
+            self._next_trial()
+
+    # Counts bytes copied for this pair. Called after every chunk; returns at once once the pair is tuned.
+    def add(self, nbytes):
+        if self.tuned:
+            return
+        with self._lock:
+            if self.tuned:
+                return
+            now = time.monotonic()
+            if self._window_start is None:
+                self._started = self._window_start = now
+            self._window_bytes += nbytes
+            elapsed = now - self._window_start
+            if elapsed < self._sample_seconds:
+                return
+            self._results[(self.chunk_size, self.concurrency)] = self._window_bytes / elapsed
+            if not self._trials and len({chunk for chunk, _ in self._results}) == len(self._results):
+                # Every chunk size has been tried; try lower parallelism with the best of them.
+                best_chunk = self._best()[0]
+                self._trials = [
+                    (best_chunk, concurrency) for concurrency in sorted({1, 2, self._max_concurrency // 2}, reverse=True)
+                    if 0 < concurrency < self._max_concurrency
+                ]
+            if not self._trials or now - self._started >= self._seconds:
+                self._finish()
+            else:
+                self._next_trial()
+                self._window_start = now
+                self._window_bytes = 0
+
+    def _next_trial(self):
+        self.chunk_size, self.concurrency = self._trials.pop(0)
+        self.limiter.resize(self.concurrency)
+
+    def _best(self):
+        return max(self._results, key=self._results.get)
+
+    def _finish(self):
+        best = self._best()
+        self.chunk_size, self.concurrency = best
+        self.rate = self._results[best]
+        self.limiter.resize(self.concurrency)
+        self.tuned = self.measured = True
+        logging.info(f"Tuned {self.key}: {self.chunk_size // 1024} KiB chunks, {self.concurrency} files at once, "
+                     f"{self.rate / 1_000_000:.1f} MB/s")
+
+
+# The Autotuner class hands out the PairTuning of each source/destination pair and saves tuned pairs
+# in the settings file under "devices", keyed by mount point, so the next job on the same devices
+# starts with the settings that worked best.
+class Autotuner:
+    def __init__(self, chunk_size, max_concurrency):
+        self.chunk_size = chunk_size  # Chunk size used before a pair is tuned
+        self.max_concurrency = max(1, max_concurrency)
+        self._saved = read_settings().get("devices", {})
+        self._pairs = {}
+        self._mounts = {}  # Directory -> mount point, so each directory is only resolved once
+        self._lock = threading.Lock()
+
+    # Returns the PairTuning for a task's source and its healthy destinations.
+    def pair(self, task):
+        key = f"{self._mount(os.path.dirname(task.source))} -> " + \
+              " + ".join(sorted({self._mount(os.path.dirname(path)) for path in task.healthy}))
+        with self._lock:
+            if key not in self._pairs:
+                self._pairs[key] = PairTuning(key, self.chunk_size, self.max_concurrency, self.max_concurrency,
+                                              self._saved.get(key))
+            return self._pairs[key]
+
+    def _mount(self, directory):
+        if directory not in self._mounts:
+            self._mounts[directory] = mount_point(directory)
+        return self._mounts[directory]
+
+    # Saves the settings of every pair tuned during this job.
+    def save(self):
+        tuned = {
+            pair.key: {
+                "chunk_size": pair.chunk_size,
+                "concurrency": pair.concurrency,
+                "bytes_per_second": round(pair.rate),
+                "tuned_at": time.time(),
+            }
+            for pair in self._pairs.values() if pair.measured
+        }
+        if not tuned:
+            return
+        try:
+            update_settings(tuned, section="devices")
+        except OSError as e:
+            logging.warning(f"Could not save tuned device settings: {e}")
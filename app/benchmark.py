@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import threading
+import tempfile
+import subprocess
+from datetime import datetime
+from app.config import BASE_DIR, HASH_ALGORITHM, VERIFY_MODE, VERSION
+from app.copyengine import CopyEngine, CopyTask
+from app.copybackends import available_backends
+
+
+# Returns (path, size) for a single file, or for every regular file below a directory.
+def _source_files(source):
+    if os.path.isfile(source):
+        return [(source, os.path.getsize(source))]
+    files = []
+    for directory, _, names in os.walk(source):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                files.append((path, os.path.getsize(path)))
+    if not files:
+        raise ValueError(f"No files to copy in {source}")
+    return files
+
+
+# Drops the source files' cached pages where supported, so every run reads from the device.
+def _drop_cache(files):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path, _ in files:
+        with open(path, "rb") as file:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+# Copies source (a file or a directory) into a scratch directory under destination through the copy engine,
+# `runs` times per backend, and yields one result per run. Each run hashes with `algorithm` and checks sizes,
+# as a "sidecar" ingest would; the scratch copies are removed afterwards.
+def compare_backends(source, destination, backends=None, algorithm=HASH_ALGORITHM, runs=3):
+    files = _source_files(source)
+    total = sum(size for _, size in files)
+    backends = backends or available_backends()
+    os.makedirs(destination, exist_ok=True)
+    for backend in backends:
+        for run in range(1, runs + 1):
+            scratch = tempfile.mkdtemp(prefix=".benchmark-", dir=destination)
+            try:
+                tasks = [
+                    CopyTask(index, path, [os.path.join(scratch, f"{index:06d}-{os.path.basename(path)}")], size)
+                    for index, (path, size) in enumerate(files, 1)
+                ]
+                engine = CopyEngine(algorithm=algorithm, verify_mode="sidecar", backend=backend, autotune=False)
+                _drop_cache(files)
+                cpu_start = time.process_time()
+                start = time.perf_counter()
+                engine.copy_all(tasks)
+                seconds = time.perf_counter() - start
+                cpu_seconds = time.process_time() - cpu_start
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+            yield {
+                "backend": backend,
+                "run": run,
+                "bytes": total,
+                "files": len(files),
+                "seconds": round(seconds, 3),
+                "mb_per_second": round(total / seconds / 1_000_000, 1) if seconds else None,
+                "cpu_seconds": round(cpu_seconds, 3),
+                "used": sorted(engine.backends_used),
+            }
+
+
+# Synthetic card layouts for the ingest benchmark: media type and a list of (path pattern, file count, file size).
+# {number} counts from 1 within an entry and {folder} moves on to the next DCIM-style folder every 100 files.
+CARD_LAYOUTS = {
+    "tiny-jpegs": ("Images", [
+        ("DCIM/{folder}CANON/IMG_{number:04d}.JPG", 2000, 48 * 1024),
+    ]),
+    "huge-clips": ("Video", [
+        ("PRIVATE/M4ROOT/CLIP/C{number:04d}.MP4", 4, 1024 * 1024 * 1024),
+        ("PRIVATE/M4ROOT/CLIP/C{number:04d}M01.XML", 4, 4 * 1024),
+    ]),
+    "mixed": ("Video", [
+        ("DCIM/{folder}GOPRO/GX01{number:04d}.MP4", 20, 64 * 1024 * 1024),
+        ("DCIM/{folder}GOPRO/GX01{number:04d}.THM", 20, 16 * 1024),
+        ("DCIM/{folder}GOPRO/GL01{number:04d}.LRV", 20, 4 * 1024 * 1024),
+        ("PRIVATE/M4ROOT/CLIP/C{number:04d}.MP4", 6, 256 * 1024 * 1024),
+        ("PRIVATE/M4ROOT/CLIP/C{number:04d}M01.XML", 6, 4 * 1024),
+        ("DCIM/{folder}MEDIA/DJI_{number:04d}.MOV", 250, 2 * 1024 * 1024),
+        ("MISC/THUMBNAILS/{folder}/THM_{number:04d}.JPG", 300, 24 * 1024),
+    ]),
+}
+
+_FILL_BYTES = 1024 * 1024  # Size of the random block repeated to fill synthetic files
+
+
+# Writes a synthetic card for a layout below directory and returns (file count, total bytes).
+# scale multiplies the number of files (at least one per entry); file sizes stay as listed, so the
+# per-file overheads stay comparable between runs. Every file starts with a unique header so no two are identical.
+def generate_card(layout, directory, scale=1.0):
+    _, entries = CARD_LAYOUTS[layout]
+    block = os.urandom(_FILL_BYTES)
+    files = 0
+    total = 0
+    for pattern, count, size in entries:
+        for number in range(1, max(1, round(count * scale)) + 1):
+            path = os.path.join(directory, pattern.format(number=number, folder=100 + (number - 1) // 100))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            header = f"{layout}:{path}\n".encode("utf-8")[:size]
+            with open(path, "wb") as file:
+                file.write(header)
+                remaining = size - len(header)
+                while remaining > 0:
+                    written = file.write(block[:remaining])
+                    remaining -= written
+            files += 1
+            total += size
+    return files, total
+
+
+# Runs one ingest of a synthetic card in this process and returns its measurements, counting the files
+# and bytes the ingest actually copied: files the media type does not take are on the card but not ingested.
+# Called in a child process by run_ingest_benchmark so peak memory is the ingest's own.
+def _ingest_card(card, export, media_type, algorithm, verify_mode):
+    from app.ingest import IngestJob, IngestReporter
+
+    copied = {"files": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    class CountingReporter(IngestReporter):
+        def file_completed(self, task):
+            with lock:
+                copied["files"] += 1
+                copied["bytes"] += task.size
+
+    job = IngestJob(card, export, "BENCH", media_type, datetime.now().strftime("%d/%m/%Y"), "01", "0001",
+                    hash_algorithm=algorithm, verify_mode=verify_mode, skip_ingested=False)
+    start = time.perf_counter()
+    job.run(CountingReporter())
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, **copied, "phases": job.timings, "peak_rss_bytes": _peak_rss()}
+
+
+# Returns the peak resident memory of this process in bytes, or None where the platform cannot tell.
+def _peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Generates a synthetic card for each layout in a temporary directory below workdir (the system
+# temporary directory by default), ingests it headlessly and yields one result per layout.
+# Each ingest runs in a child process with its own log directory and settings file, so the ingest index,
+# job journals and tuned device settings of real ingests are never touched and peak memory is measured per layout.
+def run_ingest_benchmark(layouts=None, scale=1.0, algorithm=HASH_ALGORITHM, verify_mode=VERIFY_MODE, workdir=None):
+    for layout in layouts or list(CARD_LAYOUTS):
+        media_type, _ = CARD_LAYOUTS[layout]
+        scratch = tempfile.mkdtemp(prefix=".benchmark-", dir=workdir)
+        try:
+            card = os.path.join(scratch, "card")
+            export = os.path.join(scratch, "export")
+            card_files, card_bytes = generate_card(layout, card, scale)
+            _flush_card(card)
+            env = dict(os.environ, LOG_DIR=os.path.join(scratch, "log"), SETTINGS_FILE=os.path.join(scratch, "settings.json"))
+            child = subprocess.run(
+                [sys.executable, "-m", "app.benchmark", json.dumps([card, export, media_type, algorithm, verify_mode])],
+                cwd=os.path.dirname(BASE_DIR), env=env, stdout=subprocess.PIPE, check=False,
+            )
+            if child.returncode != 0:
+                raise ValueError(f"Benchmark ingest of layout {layout} failed with exit code {child.returncode}")
+            measured = json.loads(child.stdout.decode("utf-8").splitlines()[-1])
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        seconds = measured["seconds"]
+        files = measured["files"]
+        total = measured["bytes"]
+        yield {
+            "layout": layout,
+            "media_type": media_type,
+            "card_files": card_files,
+            "card_bytes": card_bytes,
+            "files": files,
+            "bytes": total,
+            "seconds": round(seconds, 3),
+            "files_per_second": round(files / seconds, 1) if seconds else None,
+            "mb_per_second": round(total / seconds / 1_000_000, 1) if seconds else None,
+            "phases": {phase: round(value, 3) for phase, value in measured["phases"].items()},
+            "peak_rss_bytes": measured["peak_rss_bytes"],
+            "hash": algorithm,
+            "verify": verify_mode,
+        }
+
+
+# Writes a generated card to disk and drops it from the page cache where supported,
+# so the ingest reads it from the device like a freshly inserted card.
+def _flush_card(card):
+    if hasattr(os, "sync"):
+        os.sync()
+    _drop_cache(_source_files(card))
+
+
+# Returns the document written by the ingest benchmark: the results with enough about the machine
+# and version to tell runs apart.
+def benchmark_report(results):
+    return {
+        "version": VERSION,
+        "time": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+# Compares results against a baseline report written by an earlier run.
+# Returns {layout: {metric: percent change}} for the layouts both runs have; positive means higher than the baseline.
+def compare_to_baseline(results, baseline):
+    previous = {result["layout"]: result for result in baseline.get("results", [])}
+    changes = {}
+    for result in results:
+        before = previous.get(result["layout"])
+        if before is None:
+            continue
+        changes[result["layout"]] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in ("files_per_second", "mb_per_second", "seconds", "peak_rss_bytes")
+            if result.get(metric) and before.get(metric)
+        }
+    return changes
+
+
+# Child process entry point of run_ingest_benchmark: ingests one card and prints the measurements as JSON.
+if __name__ == "__main__":
+    card, export, media_type, algorithm, verify_mode = json.loads(sys.argv[1])
+    print(json.dumps(_ingest_card(card, export, media_type, algorithm, verify_mode)))
@@ -0,0 +1,74 @@
+import os
+import hashlib
+from app.config import COPY_CHUNK_SIZE
+
+# Checksum algorithms offered for verification, in order of preference.
+# xxHash64 and BLAKE3 come from optional packages; MD5 is always available through hashlib.
+HASH_ALGORITHMS = ["xxhash64", "blake3", "md5"]
+
+# Verification modes: re-read the destination and hash it again, or only confirm the size
+# and store the hash in a sidecar file next to the copy.
+VERIFY_MODES = ["reread", "sidecar"]
+
+
+# Returns a new incremental hasher for the given algorithm.
+# Raises ValueError if the algorithm is unknown or its package is not installed.
+def new_hasher(algorithm):
+    if algorithm == "md5":
+        return hashlib.md5()
+    if algorithm == "xxhash64":
+        try:
+            import xxhash
+        except ImportError:
+            raise ValueError("xxhash64 checksums require the 'xxhash' package.") from None
+        return xxhash.xxh64()
+    if algorithm == "blake3":
+        try:
+            import blake3
+        except ImportError:
+            raise ValueError("BLAKE3 checksums require the 'blake3' package.") from None
+        return blake3.blake3()
+    raise ValueError(f"Unknown checksum algorithm: {algorithm}")
+
+
+# Returns the algorithms whose packages are installed.
+def available_algorithms():
+    available = []
+    for algorithm in HASH_ALGORITHMS:
+        try:
+            new_hasher(algorithm)
+        except ValueError:
+            continue
+        available.append(algorithm)
+    return available
+
+
+# Hashes an existing file and returns its hex digest.
+# The file's cached pages are dropped first where supported so the data really comes from the device.
+def hash_file(path, algorithm, chunk_size=COPY_CHUNK_SIZE):
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as file:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        while True:
+            count = file.readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher.hexdigest()
+
+
+# Returns the path of the sidecar file that holds the digest of path.
+def sidecar_path(path, algorithm):
+    return f"{path}.{algorithm}"
+
+
+# Writes a sidecar file holding the digest of path, in the "<digest>  <name>" format used by md5sum.
+# The file is written to target, or under its final name next to path if no target is given.
+def write_sidecar(path, algorithm, digest, target=None):
+    target = target or sidecar_path(path, algorithm)
+    with open(target, "w") as file:
+        file.write(f"{digest}  {os.path.basename(path)}\n")
+    return target
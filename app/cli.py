@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+from app.config import (
+    APP_NAME, VERSION, VALID_FILE_EXTENSIONS, DEFAULT_MEDIA_TYPE,
+    HASH_ALGORITHM, VERIFY_MODE, MANIFEST_FORMAT
+)
+from app.checksums import HASH_ALGORITHMS, VERIFY_MODES
+from app.manifest import MANIFEST_FORMATS
+from app.copybackends import COPY_BACKENDS
+from app.ingest import IngestJob, IngestReporter
+from app.preflight import PreflightError
+
+# Synthetic card layouts of the "benchmark" command (see app.benchmark.CARD_LAYOUTS).
+CARD_LAYOUT_NAMES = ("tiny-jpegs", "huge-clips", "mixed")
+
+# Process exit codes for headless runs. argparse itself exits with 2 on invalid arguments.
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3  # Completed, but at least one export destination failed and was dropped
+EXIT_PREFLIGHT = 4  # Pre-flight checks failed; nothing was renamed or copied
+
+
+# Writes one JSON event per line to stdout so scripts can follow an ingest as it runs.
+def emit(event, **fields):
+    sys.stdout.write(json.dumps({"event": event, "time": time.time(), **fields}) + "\n")
+    sys.stdout.flush()
+
+
+# The JsonLinesReporter class prints ingest progress as JSON lines.
+class JsonLinesReporter(IngestReporter):
+    def __init__(self):
+        self.failed_destinations = {}  # Export directories dropped during the run, mapped to the error message
+
+    def progress(self, done_bytes, total_bytes, rate, eta):
+        emit(
+            "progress",
+            done_bytes=done_bytes,
+            total_bytes=total_bytes,
+            percent=int((done_bytes / total_bytes) * 100) if total_bytes else 100,
+            mb_per_second=round(rate / 1_000_000, 2),
+            eta_seconds=eta,
+        )
+
+    def preflight(self, report):
+        emit_preflight(report)
+
+    def file_completed(self, task):
+        emit("file", index=task.index, source=task.source, destinations=task.healthy,
+             size=task.size, digest=task.digest, verified=task.verified)
+
+    def destination_failed(self, directory, message):
+        self.failed_destinations[directory] = message
+        emit("destination_failed", destination=directory, message=message)
+
+
+# Prints the outcome of the pre-flight checks.
+def emit_preflight(report):
+    emit(
+        "preflight",
+        ok=report.ok,
+        files=report.files,
+        total_bytes=report.total_bytes,
+        remaining_bytes=report.remaining_bytes,
+        space={path: {"needed_bytes": needed, "free_bytes": free} for path, (needed, free) in report.space.items()},
+        collisions=report.collisions,
+        problems=report.problems,
+    )
+
+
+# Validates a dd/mm/yyyy capture date, the same format the GUI produces.
+def capture_date(text):
+    try:
+        datetime.strptime(text, "%d/%m/%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid capture date '{text}', expected DD/MM/YYYY") from None
+    return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="simpleingest.py",
+        description=f"{APP_NAME} v{VERSION}. Run without arguments to start the GUI.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Rename, copy and verify media without the GUI.")
+    ingest.add_argument("--project", required=True, help="Project name")
+    ingest.add_argument("--import", dest="import_path", required=True, help="Directory the media is imported from")
+    ingest.add_argument("--export", dest="export_paths", action="append", required=True,
+                        help="Directory the media is copied to; repeat to copy to several destinations at once")
+    ingest.add_argument("--media-type", default=DEFAULT_MEDIA_TYPE, choices=list(VALID_FILE_EXTENSIONS.keys()))
+    ingest.add_argument("--capture-date", type=capture_date, default=datetime.now().strftime("%d/%m/%Y"),
+                        help="Capture date as DD/MM/YYYY (default: today)")
+    ingest.add_argument("--camera", required=True, help="Camera number (padded to 2 digits)")
+    ingest.add_argument("--scene", required=True, help="Scene number (padded to 4 digits)")
+    ingest.add_argument("--hash", dest="hash_algorithm", default=HASH_ALGORITHM, choices=HASH_ALGORITHMS)
+    ingest.add_argument("--verify", dest="verify_mode", default=VERIFY_MODE, choices=VERIFY_MODES)
+    ingest.add_argument("--manifest", dest="manifest_format", default=MANIFEST_FORMAT, choices=MANIFEST_FORMATS)
+    ingest.add_argument("--reingest", action="store_true",
+                        help="Copy files again even if the ingest index shows this project already has them")
+    ingest.add_argument("--dry-run", action="store_true",
+                        help="Print the rename/copy plan and the pre-flight checks without touching any file")
+
+    benchmark = commands.add_parser("benchmark-copy", help="Compare copy backends on a source/destination pair.")
+    benchmark.add_argument("--source", required=True, help="File or directory to copy")
+    benchmark.add_argument("--dest", required=True, help="Directory to copy into (a scratch directory is used)")
+    benchmark.add_argument("--backend", dest="backends", action="append", choices=COPY_BACKENDS,
+                           help="Backend to test; repeat for several (default: every available backend)")
+    benchmark.add_argument("--hash", dest="hash_algorithm", default=HASH_ALGORITHM, choices=HASH_ALGORITHMS)
+    benchmark.add_argument("--runs", type=int, default=3, help="Runs per backend (default: 3)")
+
+    suite = commands.add_parser("benchmark", help="Ingest synthetic cards and measure throughput, phases and memory.")
+    suite.add_argument("--layout", dest="layouts", action="append", choices=CARD_LAYOUT_NAMES,
+                       help="Card layout to ingest; repeat for several (default: all)")
+    suite.add_argument("--scale", type=float, default=1.0, help="Multiplier for the number of files per card")
+    suite.add_argument("--hash", dest="hash_algorithm", default=HASH_ALGORITHM, choices=HASH_ALGORITHMS)
+    suite.add_argument("--verify", dest="verify_mode", default=VERIFY_MODE, choices=VERIFY_MODES)
+    suite.add_argument("--workdir", help="Directory the cards and copies are created in (default: system temp)")
+    suite.add_argument("--output", help="Write the results to this JSON file")
+    suite.add_argument("--baseline", help="JSON file from an earlier run to compare the results against")
+    return parser
+
+
+def run_ingest(args):
+    job = IngestJob(
+        args.import_path,
+        args.export_paths,
+        args.project,
+        args.media_type,
+        args.capture_date,
+        args.camera.zfill(2),
+        args.scene.zfill(4),
+        hash_algorithm=args.hash_algorithm,
+        verify_mode=args.verify_mode,
+        manifest_format=args.manifest_format,
+        skip_ingested=not args.reingest,
+    )
+    if args.dry_run:
+        return run_dry_run(job)
+    emit("started", **job.job_params())
+    reporter = JsonLinesReporter()
+    try:
+        manifest_paths = job.run(reporter)
+    except PreflightError as e:
+        emit("failed", message=str(e), failed_destinations={})
+        return EXIT_PREFLIGHT
+    except Exception as e:
+        logging.error(f"Batch processing failed: {e}")
+        emit("failed", message=str(e), failed_destinations=reporter.failed_destinations)
+        return EXIT_FAILED
+    emit("completed", manifests=manifest_paths, failed_destinations=reporter.failed_destinations)
+    return EXIT_PARTIAL if reporter.failed_destinations else EXIT_OK
+
+
+# Prints the plan of an ingest and its pre-flight checks without renaming or copying anything.
+def run_dry_run(job):
+    try:
+        entries, report = job.preview()
+    except Exception as e:
+        logging.error(f"Planning failed: {e}")
+        emit("failed", message=str(e))
+        return EXIT_FAILED
+    for entry in entries:
+        emit("planned", index=entry.index, clip=entry.clip, source=entry.source, name=entry.name, size=entry.size,
+             destinations=[os.path.join(path, entry.name) for path in job.export_paths])
+    emit_preflight(report)
+    return EXIT_OK if report.ok else EXIT_PREFLIGHT
+
+
+def run_benchmark_copy(args):
+    from app.benchmark import compare_backends
+
+    results = {}
+    try:
+        for result in compare_backends(args.source, args.dest, args.backends, args.hash_algorithm, max(1, args.runs)):
+            emit("benchmark", **result)
+            results.setdefault(result["backend"], []).append(result["mb_per_second"])
+    except Exception as e:
+        logging.error(f"Benchmark failed: {e}")
+        emit("failed", message=str(e))
+        return EXIT_FAILED
+    emit("completed", mb_per_second={backend: max(rates) for backend, rates in results.items()})
+    return EXIT_OK
+
+
+# Ingests synthetic cards and prints one "benchmark" event per layout. The results can be written to a
+# JSON file and compared against one from an earlier run to spot regressions.
+def run_benchmark(args):
+    from app.benchmark import run_ingest_benchmark, benchmark_report, compare_to_baseline
+
+    results = []
+    try:
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+        for result in run_ingest_benchmark(args.layouts, args.scale, args.hash_algorithm, args.verify_mode,
+                                           args.workdir):
+            emit("benchmark", **result)
+            results.append(result)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(benchmark_report(results), file, indent=2)
+    except Exception as e:
+        logging.error(f"Benchmark failed: {e}")
+        emit("failed", message=str(e))
+        return EXIT_FAILED
+    emit("completed", output=args.output, baseline_change=compare_to_baseline(results, baseline) if baseline else None)
+    return EXIT_OK
+
+
+# Entry point for headless runs. Never imports PyQt5, so it works on machines without a display.
+def main(argv):
+    args = build_parser().parse_args(argv)
+    if args.command == "ingest":
+        return run_ingest(args)
+    if args.command == "benchmark-copy":
+        return run_benchmark_copy(args)
+    if args.command == "benchmark":
+        return run_benchmark(args)
+    return EXIT_USAGE
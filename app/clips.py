@@ -0,0 +1,129 @@
+import os
+import re
+import logging
+from app.config import SIDECAR_EXTENSIONS, SPAN_SEGMENT_BYTES
+
+# GoPro chaptered recordings: GX010123.MP4, GX020123.MP4, ... (HERO6 and later) or GOPR0123.MP4,
+# GP010123.MP4, ... (older models). All chapters of one recording share the last four digits, and so
+# do its low-res proxies (GL010123.LRV), so GoPro files are grouped on the recording number alone.
+_GOPRO_CHAPTER = re.compile(r"^G[HXL](\d{2})(\d{4})$")
+_GOPRO_FIRST = re.compile(r"^GOPR(\d{4})$")
+_GOPRO_LATER = re.compile(r"^GP(\d{2})(\d{4})$")
+
+# Sony XAVC metadata next to the clip: C0001.MP4 has C0001M01.XML.
+_SONY_METADATA = re.compile(r"^(.+)(M\d{2})$")
+
+
+# The ClipMember class is one file of a clip, with the suffix that keeps its new name apart from
+# the clip's other files (e.g. "M01" for Sony metadata, "_02" for the second chapter).
+class ClipMember:
+    def __init__(self, path, size, mtime_ns, suffix=""):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.suffix = suffix
+        self.part = 1  # Chapter or segment of a spanned recording this file belongs to
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.path)[1]
+
+
+# The Clip class is one logical recording: its media files (several for a spanned clip) and their sidecars.
+# A clip gets one file number and is scheduled as a unit.
+class Clip:
+    def __init__(self, key):
+        self.key = key  # (directory, stem) the files were grouped under
+        self.members = []
+
+    @property
+    def size(self):
+        return sum(member.size for member in self.members)
+
+    # True if the clip has at least one media file, not only sidecars.
+    @property
+    def has_media(self):
+        return any(member.extension.lower() not in SIDECAR_EXTENSIONS for member in self.members)
+
+
+# Returns the grouping key of a file, its chapter number and the suffix its new name keeps.
+# Files that belong together get the same key: same folder and stem, with the camera layouts
+# above mapped onto that (AVCHD clip info lives in CLIPINF next to STREAM).
+def _clip_key(path):
+    directory, filename = os.path.split(path)
+    stem, ext = os.path.splitext(filename)
+    stem = stem.upper()
+    ext = ext.lower()
+    if ext == ".cpi" and os.path.basename(directory).upper() == "CLIPINF":
+        directory = os.path.join(os.path.dirname(directory), "STREAM")
+    match = _GOPRO_CHAPTER.match(stem)
+    if match:
+        return (directory, "GOPR" + match.group(2)), int(match.group(1)), ""
+    match = _GOPRO_FIRST.match(stem)
+    if match:
+        return (directory, "GOPR" + match.group(1)), 1, ""
+    match = _GOPRO_LATER.match(stem)
+    if match:
+        return (directory, "GOPR" + match.group(2)), int(match.group(1)) + 1, ""
+    match = _SONY_METADATA.match(stem)
+    if match and ext == ".xml":
+        return (directory, match.group(1)), 1, match.group(2)
+    return (directory, stem), 1, ""
+
+
+# Joins AVCHD recordings that the camera split across consecutive STREAM/NNNNN.MTS files.
+# A segment that reached SPAN_SEGMENT_BYTES was cut by the card's file size limit, so the
+# next numbered clip in the same folder continues it.
+def _join_spanned(clips, span_bytes):
+    joined = []
+    previous = None
+    for clip in clips:
+        directory, stem = clip.key
+        segment = next((member for member in clip.members if member.extension.lower() == ".mts"), None)
+        if previous is not None and segment is not None and previous[0] == directory \
+                and stem.isdigit() and int(stem) == previous[1] + 1 and previous[2] >= span_bytes:
+            part = max(member.part for member in previous[3].members) + 1
+            for member in clip.members:
+                member.part = part
+            previous[3].members.extend(clip.members)
+            previous = (directory, int(stem), segment.size, previous[3])
+            continue
+        joined.append(clip)
+        previous = (directory, int(stem), segment.size, clip) if segment is not None and stem.isdigit() else None
+    return joined
+
+
+# Groups scanned files into clips. files yields (path, size, mtime_ns) in scan order, sidecars included;
+# clips come back in the order their first file was found. Sidecars without a media file are dropped.
+def group_clips(files, span_bytes=SPAN_SEGMENT_BYTES):
+    clips = {}
+    for path, size, mtime_ns in files:
+        key, part, suffix = _clip_key(path)
+        member = ClipMember(path, size, mtime_ns, suffix)
+        member.part = part
+        clips.setdefault(key, Clip(key)).members.append(member)
+
+    grouped = []
+    for clip in _join_spanned(list(clips.values()), span_bytes):
+        if not clip.has_media:
+            logging.warning(f"Ignoring sidecar files without a clip: {', '.join(m.path for m in clip.members)}")
+            continue
+        _assign_suffixes(clip)
+        grouped.append(clip)
+    return grouped
+
+
+# Gives every member a suffix so no two files of a clip end up with the same new name.
+# Later chapters and segments are marked "_02", "_03", ...
+def _assign_suffixes(clip):
+    clip.members.sort(key=lambda member: (member.part, member.path))
+    taken = set()
+    for member in clip.members:
+        suffix = member.suffix + (f"_{member.part:02d}" if member.part > 1 else "")
+        candidate = suffix
+        count = 1
+        while (candidate.upper(), member.extension.lower()) in taken:
+            count += 1
+            candidate = f"{suffix}-{count}"
+        taken.add((candidate.upper(), member.extension.lower()))
+        member.suffix = candidate
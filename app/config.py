@@ -1,10 +1,11 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from the .env file, if there is one; python-dotenv is only imported then.
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 ENV_FILE = os.path.join(BASE_DIR, "../.env")
-load_dotenv(ENV_FILE)
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
 # Application Metadata
 APP_NAME = os.getenv("APP_NAME", "Simple Ingest Tool")
@@ -13,7 +14,11 @@ VERSION = os.getenv("VERSION", "1.1.1")
 # File and Directory Configuration
 LOG_DIR = os.getenv("LOG_DIR", os.path.join(BASE_DIR, "log"))
 LOG_FILE = os.path.join(LOG_DIR, "simpleingest.log")
-SETTINGS_FILE = os.path.join(BASE_DIR, "settings.json")
+SETTINGS_FILE = os.getenv("SETTINGS_FILE", os.path.join(BASE_DIR, "settings.json"))  # GUI fields and tuned device settings
+JOB_DIR = os.path.join(LOG_DIR, "jobs")  # Per-job ingest journals used to resume interrupted ingests
+INGEST_INDEX_FILE = os.path.join(LOG_DIR, "ingest_index.sqlite3")  # Fingerprints of every file already ingested
+METRICS_JSONL_FILE = os.path.join(LOG_DIR, "metrics.jsonl")  # Structured per-phase and per-file ingest events
+METRICS_PROMETHEUS_FILE = os.path.join(LOG_DIR, "metrics.prom")  # Per-job summary in Prometheus text format
 
 # Validation Rules
 CAMERA_NUMBER_PATTERN = r"\b\d{2}\b"  # Exactly 2 digits
@@ -23,17 +28,73 @@ SCENE_NUMBER_PATTERN = r"\b\d{4}\b"   # Exactly 4 digits
 DEFAULT_MEDIA_TYPE = os.getenv("DEFAULT_MEDIA_TYPE", "Video")
 DEFAULT_CAPTURE_DATE_FORMAT = os.getenv("DEFAULT_CAPTURE_DATE_FORMAT", "dd/MM/yyyy")
 
-# Supported File Extensions for Each Media Type
+# Supported File Extensions for Each Media Type (lower case, sets for O(1) lookups while scanning)
 VALID_FILE_EXTENSIONS = {
-    "Video": [".mp4", ".mov", ".avi", ".mkv", ".m4v", ".wmv", ".flv", ".mpeg", ".raw", ".webm"],
-    "Images": [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".gif"],
-    "Audio": [".mp3", ".wav", ".aac", ".flac", ".m4a", ".ogg", ".wma", ".aiff", ".pcm"],
+    "Video": {".mp4", ".mov", ".avi", ".mkv", ".m4v", ".wmv", ".flv", ".mpeg", ".raw", ".webm", ".mts", ".m2ts"},
+    "Images": {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".gif"},
+    "Audio": {".mp3", ".wav", ".aac", ".flac", ".m4a", ".ogg", ".wma", ".aiff", ".pcm"},
 }
 
+# Camera sidecar files copied with the clip they belong to (metadata, thumbnails, proxies, telemetry, AVCHD clip info).
+# They are never ingested on their own.
+SIDECAR_EXTENSIONS = {".xml", ".thm", ".lrv", ".lrf", ".srt", ".cpi"}
+SPAN_SEGMENT_BYTES = int(os.getenv("SPAN_SEGMENT_BYTES", str(1900 * 1000 * 1000)))  # AVCHD segments this large continue in the next file
+
+# Copy Engine Configuration
+COPY_WORKERS = int(os.getenv("COPY_WORKERS", "4"))  # Total files copied at once
+SOURCE_DEVICE_CONCURRENCY = int(os.getenv("SOURCE_DEVICE_CONCURRENCY", "2"))  # Concurrent reads per source device
+DEST_DEVICE_CONCURRENCY = int(os.getenv("DEST_DEVICE_CONCURRENCY", "4"))  # Concurrent writes per destination device
+COPY_CHUNK_SIZE = int(os.getenv("COPY_CHUNK_SIZE", str(8 * 1024 * 1024)))  # Bytes read and written per chunk
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.25"))  # Minimum seconds between progress updates
+COPY_BACKEND = os.getenv("COPY_BACKEND", "auto")  # auto, reflink, copy_file_range, sendfile or buffered
+COPY_RETRIES = int(os.getenv("COPY_RETRIES", "2"))  # Times a file is copied again after its source could not be read
+FADVISE_DONTNEED_BYTES = int(os.getenv("FADVISE_DONTNEED_BYTES", str(64 * 1024 * 1024)))  # Files this large are kept out of the page cache
+
+# Autotuning Configuration
+AUTOTUNE = os.getenv("AUTOTUNE", "on").lower() == "on"  # on: tune chunk size and parallelism per device pair
+AUTOTUNE_SECONDS = float(os.getenv("AUTOTUNE_SECONDS", "12"))  # Longest time spent trying settings at the start of a job
+AUTOTUNE_SAMPLE_SECONDS = float(os.getenv("AUTOTUNE_SAMPLE_SECONDS", "1.5"))  # Time each setting is measured for
+AUTOTUNE_CHUNK_SIZES = [int(size) for size in os.getenv(
+    "AUTOTUNE_CHUNK_SIZES", f"{1024 * 1024},{4 * 1024 * 1024},{16 * 1024 * 1024}"
+).split(",")]  # Chunk sizes tried, in bytes
+
+# Job Queue Configuration
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))  # Cards ingested at the same time
+JOBS_PER_SOURCE_DEVICE = int(os.getenv("JOBS_PER_SOURCE_DEVICE", "1"))  # Jobs reading from one device at once
+JOBS_PER_DEST_DEVICE = int(os.getenv("JOBS_PER_DEST_DEVICE", "2"))  # Jobs writing to one volume at once
+CANCEL_DRAIN_SECONDS = float(os.getenv("CANCEL_DRAIN_SECONDS", "10"))  # Time copies in flight get to finish after a cancel
+
+# Verification Configuration
+HASH_ALGORITHM = os.getenv("HASH_ALGORITHM", "xxhash64")  # xxhash64, blake3 or md5
+VERIFY_MODE = os.getenv("VERIFY_MODE", "reread")  # reread (hash the copy again) or sidecar (size check + hash file)
+MANIFEST_FORMAT = os.getenv("MANIFEST_FORMAT", "mhl")  # mhl or csv
+
+# Durability Configuration
+FSYNC_POLICY = os.getenv("FSYNC_POLICY", "batch")  # file, batch or job: when staged copies are synced and renamed into place
+FSYNC_BATCH_FILES = int(os.getenv("FSYNC_BATCH_FILES", "64"))  # Files committed together by the "batch" policy
+FSYNC_BATCH_BYTES = int(os.getenv("FSYNC_BATCH_BYTES", str(1024 * 1024 * 1024)))  # Bytes that also close a batch
+
+# Journal Configuration
+JOURNAL_CHECKPOINT_BYTES = int(os.getenv("JOURNAL_CHECKPOINT_BYTES", str(64 * 1024 * 1024)))  # Bytes between resume points
+
+# Ingest Index Configuration
+FINGERPRINT_BYTES = int(os.getenv("FINGERPRINT_BYTES", str(1024 * 1024)))  # Bytes hashed at each end of a file to fingerprint it
+
+# Preflight Configuration
+FREE_SPACE_RESERVE = int(os.getenv("FREE_SPACE_RESERVE", str(256 * 1024 * 1024)))  # Bytes left free on each destination device
+
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+CONSOLE_MAX_LINES = int(os.getenv("CONSOLE_MAX_LINES", "5000"))  # Lines kept in the GUI log console
+CONSOLE_FLUSH_INTERVAL = int(os.getenv("CONSOLE_FLUSH_INTERVAL", "200"))  # Milliseconds between console updates
+
+# Metrics Configuration
+METRICS_FORMAT = os.getenv("METRICS_FORMAT", "off")  # off, jsonl, prometheus or "jsonl,prometheus"
+
 
-# Ensure required directories exist
-os.makedirs(LOG_DIR, exist_ok=True)
+# Creates the log directory. Called by whatever writes there first rather than when this module is imported,
+# so importing the configuration never touches the disk beyond reading .env.
+def ensure_log_dir():
+    os.makedirs(LOG_DIR, exist_ok=True)
 
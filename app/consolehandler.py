@@ -1,24 +1,42 @@
 import logging
+from collections import deque
+from PyQt5.QtCore import QTimer
+from app.config import CONSOLE_MAX_LINES, CONSOLE_FLUSH_INTERVAL
 
-# The LogHandler class is a custom logging handler that outputs log messages to a QTextEdit widget.
-# This allows logs to be displayed in a PyQt GUI application in real-time.
+# The LogHandler class shows log messages in a QPlainTextEdit without touching the widget from other threads.
+# emit() runs on the logging listener thread and only queues the formatted line; a timer on the GUI
+# thread appends everything queued since the last tick in one call. The console keeps at most
+# CONSOLE_MAX_LINES lines, dropping the oldest, so a long ingest cannot grow it without bound.
 class LogHandler(logging.Handler):
-    # Constructor: Initializes the custom logging handler with a QTextEdit widget.
-    # The text_edit parameter is the QTextEdit widget where log messages will be displayed.
-    def __init__(self, text_edit):
+    # Constructor: Initializes the handler with the QPlainTextEdit widget where log messages are displayed.
+    # Must be created on the GUI thread, which owns the flush timer.
+    def __init__(self, text_edit, max_lines=CONSOLE_MAX_LINES, interval=CONSOLE_FLUSH_INTERVAL):
         super().__init__()  # Initialize the base logging.Handler class.
-        self.text_edit = text_edit  # Store the reference to the QTextEdit widget.
+        self.text_edit = text_edit  # Store the reference to the QPlainTextEdit widget.
+        self.text_edit.setMaximumBlockCount(max_lines)
+        self._pending = deque(maxlen=max_lines)  # Lines waiting for the next flush; a burst keeps only the newest
+        self.timer = QTimer(text_edit)
+        self.timer.timeout.connect(self.flush_to_console)
+        self.timer.start(interval)
 
-    # The emit method is called whenever a log message is generated.
-    # It formats the log record and appends it to the QTextEdit widget.
+    # The emit method is called on the listener thread for every log record.
+    # It formats the record and leaves it for the GUI thread.
     def emit(self, record):
-        # Format the log record into a string message.
-        message = self.format(record)
+        try:
+            self._pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
 
-        # Append the formatted log message to the QTextEdit widget.
-        self.text_edit.appendPlainText(message)
-
-        # Automatically scroll the QTextEdit widget to display the latest log message.
-        self.text_edit.verticalScrollBar().setValue(
-            self.text_edit.verticalScrollBar().maximum()
-        )
\ No newline at end of file
+    # Appends all queued lines to the console in one batch. Runs on the GUI thread.
+    # The view only follows new output if it was already scrolled to the end.
+    def flush_to_console(self):
+        if not self._pending:
+            return
+        lines = []
+        while self._pending:
+            lines.append(self._pending.popleft())
+        scrollbar = self.text_edit.verticalScrollBar()
+        following = scrollbar.value() == scrollbar.maximum()
+        self.text_edit.appendPlainText("\n".join(lines))
+        if following:
+            scrollbar.setValue(scrollbar.maximum())
@@ -0,0 +1,55 @@
+import time
+import threading
+from app.config import CANCEL_DRAIN_SECONDS
+
+
+# Raised inside a running ingest when its job has been cancelled.
+class IngestCancelled(Exception):
+    pass
+
+
+# The JobControl class lets another thread pause, resume or cancel a running ingest.
+# The ingest calls checkpoint() between files and between copy chunks; that is where it
+# blocks while paused and where a cancellation takes effect. After a cancellation no new file
+# is started, and copies in flight may finish only if they can do so within drain_seconds.
+class JobControl:
+    def __init__(self, drain_seconds=CANCEL_DRAIN_SECONDS):
+        self.drain_seconds = drain_seconds  # Time copies in flight get to finish after a cancellation
+        self._deadline = None  # time.monotonic() by which draining copies must be done
+        self._cancelled = threading.Event()
+        self._running = threading.Event()  # Cleared while paused
+        self._running.set()
+
+    def cancel(self):
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.drain_seconds
+        self._cancelled.set()
+        self._running.set()  # Wake paused workers so they see the cancellation
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    # Blocks while the job is paused and raises IngestCancelled once it has been cancelled.
+    # Work already in flight passes remaining, a function estimating the seconds it still needs; it is
+    # only called after a cancellation, and the work may carry on if it would end before the drain deadline.
+    def checkpoint(self, remaining=None):
+        self._running.wait()
+        if self._cancelled.is_set():
+            if remaining is None or time.monotonic() + remaining() > self._deadline:
+                raise IngestCancelled("Ingest cancelled.")
+
+    # Waits for the given number of seconds, returning early and raising IngestCancelled if the job is cancelled.
+    def sleep(self, seconds):
+        self._cancelled.wait(seconds)
+        self.checkpoint()
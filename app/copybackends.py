@@ -0,0 +1,71 @@
+import os
+import sys
+import errno
+
+# Ways the copy engine can move data to a destination, fastest first.
+# "auto" tries each kernel backend in turn for every source/destination device pair and
+# falls back down the list; "buffered" writes from the engine's own buffer and always works.
+COPY_BACKENDS = ["auto", "reflink", "copy_file_range", "sendfile", "buffered"]
+
+# Linux ioctl that makes a file share another file's extents (btrfs, XFS, bcachefs, ...).
+FICLONE = 0x40049409
+
+# Errors meaning "this backend cannot be used between these two files", as opposed to a real I/O error.
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY}
+if hasattr(errno, "ENOTSUP"):
+    UNSUPPORTED_ERRNOS.add(errno.ENOTSUP)
+
+
+# Returns the backends this platform offers, in COPY_BACKENDS order ("auto" excluded).
+# Kernel copies into regular files are a Linux feature; elsewhere only the buffered loop is used.
+def available_backends():
+    available = []
+    if sys.platform.startswith("linux"):
+        available.append("reflink")
+        if hasattr(os, "copy_file_range"):
+            available.append("copy_file_range")
+        if hasattr(os, "sendfile"):
+            available.append("sendfile")
+    available.append("buffered")
+    return available
+
+
+# Returns the kernel backends to try, in order, for the given backend setting.
+# Raises ValueError if the backend is unknown or not available on this platform.
+def kernel_backends(backend):
+    if backend not in COPY_BACKENDS:
+        raise ValueError(f"Unknown copy backend: {backend}")
+    available = available_backends()
+    if backend == "auto":
+        return [name for name in available if name != "buffered"]
+    if backend not in available:
+        raise ValueError(f"Copy backend '{backend}' is not available on this platform.")
+    return [] if backend == "buffered" else [backend]
+
+
+# Clones the whole source into an empty destination without copying any data.
+def clone_file(src_fd, dst_fd):
+    import fcntl
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+# Copies up to count bytes of the source starting at offset to the destination's current position,
+# inside the kernel. The source's file position is left alone. Returns the number of bytes copied,
+# which may be short; 0 means the backend cannot make progress for this pair of files.
+def kernel_copy(backend, src_fd, dst_fd, offset, count):
+    if backend == "copy_file_range":
+        return os.copy_file_range(src_fd, dst_fd, count, offset)
+    if backend == "sendfile":
+        return os.sendfile(dst_fd, src_fd, offset, count)
+    raise ValueError(f"Copy backend '{backend}' does not copy ranges.")
+
+
+# Gives the kernel an access pattern hint ("POSIX_FADV_SEQUENTIAL", "POSIX_FADV_DONTNEED", ...) for a range
+# of an open file. A no-op where posix_fadvise is missing (macOS, Windows) or the filesystem rejects it.
+def advise(fd, offset, length, advice):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice))
+    except OSError:
+        pass
@@ -0,0 +1,502 @@
+import os
+import time
+import logging
+import threading
+from functools import partial
+from contextlib import ExitStack, nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, FIRST_EXCEPTION, wait
+from app.config import (
+    COPY_WORKERS, SOURCE_DEVICE_CONCURRENCY, DEST_DEVICE_CONCURRENCY, COPY_CHUNK_SIZE,
+    HASH_ALGORITHM, VERIFY_MODE, JOURNAL_CHECKPOINT_BYTES, COPY_BACKEND, COPY_RETRIES, FSYNC_POLICY,
+    AUTOTUNE, FADVISE_DONTNEED_BYTES
+)
+from app.checksums import new_hasher, hash_file, sidecar_path, write_sidecar
+from app.copybackends import UNSUPPORTED_ERRNOS, kernel_backends, clone_file, kernel_copy, advise
+from app.autotune import Autotuner
+from app.durable import StagedCommitter, staging_path
+from app.control import JobControl, IngestCancelled
+
+
+# Returns an identifier for the physical device a path lives on.
+# Paths that do not exist yet (e.g. a new export directory) are resolved through their nearest existing parent.
+def device_id(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.stat(path).st_dev
+
+
+# The CopyTask class describes a single source file copied to one or more destinations.
+class CopyTask:
+    def __init__(self, index, source, destinations, size=0, resume_offset=0):
+        self.index = index  # Deterministic file number assigned during planning
+        self.source = source  # Path of the (renamed) source file
+        self.destinations = list(destinations)  # Full path of the file in each export directory
+        self.size = size  # Size of the source file in bytes
+        self.resume_offset = resume_offset  # Bytes already confirmed at the destinations by an earlier run
+        self.digest = None  # Checksum of the source data, computed while copying
+        self.verified = False  # True once every healthy destination has been confirmed against the digest
+        self.failed = {}  # Destinations that failed, mapped to the error message
+        self.timings = {"copy": 0.0, "verify": 0.0, "fsync": 0.0}  # Seconds spent on each step of this file
+        self.retries = 0  # Times the copy was started again after the source could not be read
+        self.transferred = 0  # Bytes copied past resume_offset by the current attempt
+        self.synced = False  # True once the staged copies have been flushed to disk in full
+        self.sidecars = {}  # Destination -> checksum sidecar staged beside it by "sidecar" verification
+
+    # Destinations that have not failed.
+    @property
+    def healthy(self):
+        return [path for path in self.destinations if path not in self.failed]
+
+
+# The SourceReadError class marks a failure to read the source of a copy (a card reader hiccup or a
+# card pulled and reinserted), which is worth retrying, as opposed to a destination failure.
+class SourceReadError(OSError):
+    pass
+
+
+# The DeviceLimiter class hands out one semaphore per device so that each device
+# only ever sees a bounded number of concurrent readers or writers.
+class DeviceLimiter:
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def get(self, device):
+        with self._lock:
+            if device not in self._semaphores:
+                self._semaphores[device] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[device]
+
+
+# The CopyEngine class copies several files at once through a bounded worker pool.
+# Reads are limited per source device and writes per destination device, so a slow card reader
+# is never hammered by every worker while the destination array sits idle.
+# Each file is read once and every chunk is written to all of its destinations. A destination that
+# fails (full, unplugged, bad checksum) is dropped for the rest of the job while the others carry on;
+# the copy only fails once no destination is left.
+# On Linux the data is moved to the destinations inside the kernel (reflink, copy_file_range or sendfile)
+# where the filesystems allow it; the chunk is still read once into the buffer for the checksum.
+# Copies are written to hidden staging files next to their destinations and only renamed into place
+# once verified and on disk (see StagedCommitter), in batches set by the fsync policy.
+# With autotune on, the chunk size and the number of files copied at once are tuned for each
+# source/destination device pair during the first seconds of a job (see PairTuning).
+class CopyEngine:
+    def __init__(self, workers=COPY_WORKERS, source_limit=SOURCE_DEVICE_CONCURRENCY, dest_limit=DEST_DEVICE_CONCURRENCY,
+                 chunk_size=COPY_CHUNK_SIZE, algorithm=HASH_ALGORITHM, verify_mode=VERIFY_MODE,
+                 checkpoint_bytes=JOURNAL_CHECKPOINT_BYTES, control=None, backend=COPY_BACKEND, retries=COPY_RETRIES,
+                 fsync_policy=FSYNC_POLICY, autotune=AUTOTUNE):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self.verify_mode = verify_mode
+        self.backend = backend
+        self.kernel_backends = kernel_backends(backend)  # Kernel backends to try, in order
+        self.backends_used = set()  # Backends that actually wrote data, "buffered" included
+        self._unsupported = set()  # (backend, source device, destination device) combinations that failed as unsupported
+        self.busy_seconds = {"copy": 0.0, "verify": 0.0, "fsync": 0.0}  # Worker time per step, summed over workers
+        self.retries = max(0, retries)  # Times a file is copied again after a source read error
+        self.fsync_policy = fsync_policy  # When staged copies are flushed and renamed into place: file, batch or job
+        self._committer = None
+        # A device pair never copies more files at once than its source and destination device limits allow,
+        # so the tuner only tries parallelism that can actually happen.
+        pair_limit = min(self.workers, max(1, source_limit), max(1, dest_limit))
+        self.tuner = Autotuner(chunk_size, pair_limit) if autotune else None  # Per device pair chunk size and parallelism
+        self._busy_lock = threading.Lock()
+        self.checkpoint_bytes = checkpoint_bytes
+        self.control = control or JobControl()  # Checked between chunks for pause and cancel requests
+        self.failed_destinations = {}  # Export directories dropped after a failure, mapped to the error message
+        self._failed_lock = threading.Lock()
+        self._on_destination_failed = None
+        self._local = threading.local()  # One copy buffer per worker thread, reused across files
+        self.source_limiter = DeviceLimiter(source_limit)
+        self.dest_limiter = DeviceLimiter(dest_limit)
+
+    # Copies every task and calls on_file_done(task) as each one is verified and durably in place: from a
+    # worker thread, or from the calling thread for files committed when the last batch is flushed.
+    # tasks may be any iterable, including a generator that is still scanning; it is consumed as workers
+    # free up, with at most two tasks per worker queued at a time.
+    # on_bytes(nbytes) is called after every chunk written, from whichever worker wrote it.
+    # on_checkpoint(task, offset) is called whenever the destinations have been flushed to disk up to offset.
+    # on_destination_failed(directory, message) is called once for each export directory that is dropped.
+    # on_batch_committing(tasks) is called with each batch of files committed together before they are
+    # renamed into place, and on_batch_committed() after the batch's on_file_done calls.
+    # The first failure stops any copies that have not started yet and is re-raised to the caller.
+    # When the job is cancelled, copies in flight are drained: those that finish within the control's
+    # drain time are verified and committed before IngestCancelled is raised, the others stop at their next chunk.
+    def copy_all(self, tasks, on_file_done=None, on_bytes=None, on_checkpoint=None, on_destination_failed=None,
+                 on_batch_committing=None, on_batch_committed=None):
+        self._on_destination_failed = on_destination_failed
+        self._committer = StagedCommitter(on_file_done or (lambda task: None), self._fail_destination, self.fsync_policy,
+                                          on_batch=on_batch_committed, on_batch_start=on_batch_committing)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy") as executor:
+                in_flight = set()
+                try:
+                    for task in tasks:
+                        if len(in_flight) >= self.workers * 2:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            self._raise_failures(done)
+                        in_flight.add(executor.submit(self._copy_task, task, on_file_done, on_bytes, on_checkpoint))
+                    done, in_flight = wait(in_flight, return_when=FIRST_EXCEPTION)
+                    self._raise_failures(done)
+                except BaseException:
+                    for future in in_flight:
+                        future.cancel()
+                    raise
+        except IngestCancelled:
+            # The executor has waited for the drained copies; keep what they finished.
+            self._flush_committed()
+            raise
+        self._flush_committed()
+        if self.tuner:
+            self.tuner.save()
+
+    # Commits the last batch and adds the time spent committing to the fsync busy time.
+    def _flush_committed(self):
+        try:
+            self._committer.flush()
+        finally:
+            self.busy_seconds["fsync"] += self._committer.fsync_seconds
+
+    # Re-raises the first exception among finished futures.
+    def _raise_failures(self, futures):
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+
+    # Drops a destination of a task after an error, deleting its staged files, and remembers its export
+    # directory as failed, so later files skip it. Re-raises the error if the task has no healthy destination left.
+    def _fail_destination(self, task, path, error):
+        task.failed[path] = str(error)
+        # Remove what was staged for the destination, so a full volume gets its space back.
+        for staged in (staging_path(path), staging_path(sidecar_path(path, self.algorithm))):
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+        directory = os.path.dirname(path)
+        with self._failed_lock:
+            first = directory not in self.failed_destinations
+            if first:
+                self.failed_destinations[directory] = str(error)
+        if first:
+            logging.error(f"Destination {directory} failed, continuing without it: {error}")
+            if self._on_destination_failed:
+                self._on_destination_failed(directory, str(error))
+        if not task.healthy:
+            raise error
+
+    # Copies and verifies a single task while holding the source and destination device slots.
+    # Slots are always taken in the same order (device pair, source, then destinations by device) so workers
+    # cannot deadlock. The pair and source slots are released before verification, which only touches the destinations.
+    def _copy_task(self, task, on_file_done, on_bytes, on_checkpoint):
+        self.control.checkpoint()
+        for path in task.healthy:
+            directory = os.path.dirname(path)
+            if directory in self.failed_destinations:
+                task.failed[path] = self.failed_destinations[directory]
+        if not task.healthy:
+            raise ValueError(f"All destinations have failed, cannot copy {task.source}")
+
+        pair = self.tuner.pair(task) if self.tuner else None
+        source_slot = self.source_limiter.get(device_id(task.source))
+        dest_devices = sorted({device_id(os.path.dirname(path)) for path in task.healthy})
+        with ExitStack() as dest_slots:
+            with pair.limiter if pair else nullcontext(), source_slot:
+                for device in dest_devices:
+                    dest_slots.enter_context(self.dest_limiter.get(device))
+                logging.debug(f"Copying file {task.source} to {', '.join(task.healthy)}")
+                started = time.perf_counter()
+                task.digest, copied = self._copy_with_retries(task, pair, on_bytes, on_checkpoint)
+                task.timings["copy"] += time.perf_counter() - started
+                for path in task.healthy:
+                    logging.info(f"File copied to export path: {path}")
+            started = time.perf_counter()
+            for path in task.healthy:
+                self._verify(task, path, copied)
+            task.timings["verify"] += time.perf_counter() - started
+        with self._busy_lock:
+            for step, seconds in task.timings.items():
+                self.busy_seconds[step] += seconds
+        task.verified = bool(task.healthy)
+        self._committer.add(task)
+
+    # Copies a task, starting again from its resume point when the source cannot be read, up to
+    # self.retries times with a growing pause so a reconnecting card reader can settle.
+    # Progress reported by a failed attempt is taken back with a negative on_bytes call.
+    def _copy_with_retries(self, task, pair, on_bytes, on_checkpoint):
+        while True:
+            try:
+                return self._copy_file(task, pair, on_bytes, on_checkpoint)
+            except SourceReadError as e:
+                if task.retries >= self.retries:
+                    raise
+                task.retries += 1
+                logging.warning(f"Reading {task.source} failed, retrying ({task.retries}/{self.retries}): {e}")
+                if on_bytes and task.transferred:
+                    on_bytes(-task.transferred)
+                self.control.sleep(task.retries)
+
+    # Estimates how long a task still needs to finish copying and verifying, from the rate of the copy so far.
+    # Used to decide whether a copy in flight can be drained after a cancellation.
+    def _remaining_seconds(self, task, started):
+        elapsed = time.monotonic() - started
+        if not task.transferred or not elapsed:
+            return float("inf")
+        left = task.size - task.resume_offset - task.transferred
+        if self.verify_mode == "reread":
+            left += task.size * len(task.healthy)
+        return left * elapsed / task.transferred
+
+    # Confirms the staged copy of one destination against the digest computed during the copy, dropping
+    # it on mismatch. "reread" hashes the copy again; "sidecar" checks its size and stages the digest
+    # beside the destination, to be committed together with it.
+    def _verify(self, task, path, copied):
+        try:
+            if self.verify_mode == "reread":
+                digest = hash_file(staging_path(path), self.algorithm, self.chunk_size)
+                if digest != task.digest:
+                    raise ValueError(f"Checksum mismatch for {path}: expected {task.digest}, got {digest}")
+            elif self.verify_mode == "sidecar":
+                size = os.path.getsize(staging_path(path))
+                if size != copied:
+                    raise ValueError(f"Size mismatch for {path}: expected {copied} bytes, got {size}")
+                sidecar = sidecar_path(path, self.algorithm)
+                write_sidecar(path, self.algorithm, task.digest, staging_path(sidecar))
+                task.sidecars[path] = sidecar
+            else:
+                raise ValueError(f"Unknown verification mode: {self.verify_mode}")
+        except (OSError, ValueError) as e:
+            self._fail_destination(task, path, e)
+            return
+        logging.info(f"File verified ({self.algorithm} {task.digest}): {path}")
+
+    # Returns this worker thread's copy buffer of the given size, allocating it on first use or when the size changes.
+    def _buffer(self, size):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) != size:
+            buffer = self._local.buffer = bytearray(size)
+        return buffer
+
+    # Writes a chunk to every open destination (or only those in `only`), dropping any that fail.
+    def _write(self, task, outputs, chunk, only=None):
+        for path, file in list(outputs.items()):
+            if only is not None and path not in only:
+                continue
+            try:
+                file.write(chunk)
+            except OSError as e:
+                self._close_failed(outputs, path)
+                self._fail_destination(task, path, e)
+
+    # Flushes every open destination to disk, dropping any that fail.
+    # The flushed pages of large files are dropped from the page cache, since they will not be read again soon.
+    def _sync(self, task, outputs):
+        started = time.perf_counter()
+        for path, file in list(outputs.items()):
+            try:
+                file.flush()
+                os.fsync(file.fileno())
+                if task.size >= FADVISE_DONTNEED_BYTES:
+                    advise(file.fileno(), 0, 0, "POSIX_FADV_DONTNEED")
+            except OSError as e:
+                self._close_failed(outputs, path)
+                self._fail_destination(task, path, e)
+        task.timings["fsync"] += time.perf_counter() - started
+
+    # Reads the next chunk of the source into view, marking a failure as a SourceReadError.
+    def _read(self, task, fsrc, view):
+        try:
+            return fsrc.readinto(view)
+        except OSError as e:
+            raise SourceReadError(e.errno, f"Cannot read {task.source}: {e.strerror or e}") from e
+
+    # Chooses how each open destination of a file is written: "reflink" clones the whole file up front,
+    # "copy_file_range" and "sendfile" copy each chunk inside the kernel from the page cache the hashing
+    # read has just filled, and None writes the chunk from the buffer. Returns {path: (backend, device pair)}.
+    def _start_backends(self, task, fsrc, outputs, resuming):
+        src_dev = os.fstat(fsrc.fileno()).st_dev
+        backends = {}
+        for path, file in list(outputs.items()):
+            try:
+                # Data written for a resumed prefix must reach the file before any kernel copy lands after it.
+                file.flush()
+                pair = (src_dev, os.fstat(file.fileno()).st_dev)
+                backends[path] = (self._clone_or_pick(fsrc, file, pair, resuming), pair)
+            except OSError as e:
+                self._close_failed(outputs, path)
+                self._fail_destination(task, path, e)
+        return backends
+
+    # Returns the first kernel backend not known to be unsupported for the device pair, trying a reflink
+    # on the way if it comes first. Returns None when only the buffered loop is left.
+    def _clone_or_pick(self, fsrc, file, pair, resuming):
+        for backend in self.kernel_backends:
+            if (backend, *pair) in self._unsupported:
+                continue
+            if backend == "reflink":
+                if resuming:
+                    continue
+                try:
+                    clone_file(fsrc.fileno(), file.fileno())
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED_ERRNOS:
+                        raise
+                    self._mark_unsupported(backend, pair, e)
+                    continue
+            self.backends_used.add(backend)
+            return backend
+        self.backends_used.add("buffered")
+        return None
+
+    # Remembers that a backend does not work between two devices so it is not tried again.
+    def _mark_unsupported(self, backend, pair, reason):
+        if (backend, *pair) not in self._unsupported:
+            self._unsupported.add((backend, *pair))
+            logging.info(f"Copy backend {backend} unavailable between devices {pair[0]} and {pair[1]}: {reason}")
+
+    # Copies a chunk that has just been read from the source at offset to every open destination using
+    # its chosen backend, dropping any that fail. A kernel backend that stops making progress is marked
+    # unsupported and the rest of the file is written from the buffer.
+    def _transfer(self, task, fsrc, outputs, backends, chunk, offset):
+        for path, file in list(outputs.items()):
+            backend, pair = backends[path]
+            if backend == "reflink":
+                continue
+            try:
+                done = 0
+                while backend and done < len(chunk):
+                    try:
+                        count = kernel_copy(backend, fsrc.fileno(), file.fileno(), offset + done, len(chunk) - done)
+                    except OSError as e:
+                        if e.errno not in UNSUPPORTED_ERRNOS:
+                            raise
+                        self._mark_unsupported(backend, pair, e)
+                        count = 0
+                    else:
+                        if not count:
+                            self._mark_unsupported(backend, pair, "no progress")
+                    if not count:
+                        backend = None
+                        backends[path] = (None, pair)
+                        self.backends_used.add("buffered")
+                    done += count
+                if done < len(chunk):
+                    file.write(chunk[done:])
+            except OSError as e:
+                self._close_failed(outputs, path)
+                self._fail_destination(task, path, e)
+
+    # Closes a failed destination, ignoring the errors a full or vanished device raises on close.
+    def _close_failed(self, outputs, path):
+        try:
+            outputs.pop(path).close()
+        except OSError:
+            pass
+
+    # Opens the staging file of every healthy destination of a task. Staging files holding the confirmed
+    # prefix of a resumed copy are truncated to it; the rest are started from scratch.
+    # Returns (open files keyed by destination, destinations missing the prefix).
+    def _open_destinations(self, task, stack, offset):
+        outputs = {}
+        behind = set()
+        for path in task.healthy:
+            staged = staging_path(path)
+            try:
+                if offset and os.path.exists(staged) and os.path.getsize(staged) >= offset:
+                    file = stack.enter_context(open(staged, "r+b"))
+                    file.truncate(offset)
+                    file.seek(offset)
+                else:
+                    file = stack.enter_context(open(staged, "wb"))
+                    if offset:
+                        logging.warning(f"Cannot resume {path} at {offset} bytes, copying it from the start")
+                        behind.add(path)
+            except OSError as e:
+                self._fail_destination(task, path, e)
+                continue
+            outputs[path] = file
+        return outputs, behind
+
+    # Copies a task's source to its destinations in chunks through the worker's reusable buffer.
+    # Each chunk is read once, hashed and passed to every destination in the same pass. The chunk size
+    # comes from the device pair's tuning (pair, or None for the fixed chunk_size) and may change mid-file.
+    # The source is read with a sequential hint; chunks of files of FADVISE_DONTNEED_BYTES or more are
+    # dropped from the page cache once written, so a large offload does not evict everything else.
+    # A task with a resume_offset keeps the destinations' confirmed prefix: the matching source bytes are
+    # hashed (and only written to destinations that lack them) and copying continues from there.
+    # The staged copies stay writable so a resumed copy can reopen them; the source's permission bits are
+    # applied when they are committed. Returns (digest, bytes copied).
+    def _copy_file(self, task, pair, on_bytes, on_checkpoint):
+        src = task.source
+        hasher = new_hasher(self.algorithm)
+        buffer = self._buffer(pair.chunk_size if pair else self.chunk_size)
+        view = memoryview(buffer)
+        drop_cache = task.size >= FADVISE_DONTNEED_BYTES
+        offset = task.resume_offset
+        task.transferred = 0
+        with ExitStack() as stack:
+            try:
+                fsrc = stack.enter_context(open(src, "rb"))
+            except OSError as e:
+                raise SourceReadError(e.errno, f"Cannot open {src}: {e.strerror or e}") from e
+            advise(fsrc.fileno(), 0, 0, "POSIX_FADV_SEQUENTIAL")
+            outputs, behind = self._open_destinations(task, stack, offset)
+            if offset:
+                logging.info(f"Resuming copy of {src} at {offset} bytes")
+                remaining = offset
+                while remaining:
+                    count = self._read(task, fsrc, view[:min(remaining, len(buffer))])
+                    if not count:
+                        raise ValueError(f"Source {src} is shorter than its resume point")
+                    chunk = view[:count]
+                    hasher.update(chunk)
+                    if behind:
+                        self._write(task, outputs, chunk, only=behind)
+                    remaining -= count
+            backends = self._start_backends(task, fsrc, outputs, resuming=bool(offset))
+            copied = offset
+            checkpoint = offset + self.checkpoint_bytes
+            started = time.monotonic()
+            remaining = partial(self._remaining_seconds, task, started)
+            while True:
+                self.control.checkpoint(remaining)
+                if pair and pair.chunk_size != len(buffer):
+                    buffer = self._buffer(pair.chunk_size)
+                    view = memoryview(buffer)
+                count = self._read(task, fsrc, buffer)
+                if not count:
+                    break
+                chunk = view[:count]
+                self._transfer(task, fsrc, outputs, backends, chunk, copied)
+                hasher.update(chunk)
+                if drop_cache:
+                    advise(fsrc.fileno(), copied, count, "POSIX_FADV_DONTNEED")
+                copied += count
+                task.transferred += count
+                if pair:
+                    pair.add(count)
+                if on_bytes:
+                    on_bytes(count)
+                if on_checkpoint and copied >= checkpoint:
+                    self._sync(task, outputs)
+                    on_checkpoint(task, copied)
+                    checkpoint = copied + self.checkpoint_bytes
+            task.synced = self.verify_mode == "reread" or self._committer.syncs_each_file
+            if task.synced:
+                # The "file" policy needs the data on disk before the rename; "reread" makes sure the
+                # verification pass reads the data back from the device, not the page cache.
+                self._sync(task, outputs)
+            # Close explicitly so a write that only fails when buffers are flushed drops just that destination.
+            for path, file in list(outputs.items()):
+                try:
+                    file.close()
+                except OSError as e:
+                    self._close_failed(outputs, path)
+                    self._fail_destination(task, path, e)
+        return hasher.hexdigest(), copied
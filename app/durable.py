@@ -0,0 +1,152 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from app.config import FSYNC_POLICY, FSYNC_BATCH_FILES, FSYNC_BATCH_BYTES
+
+# When staged copies are flushed to disk and moved to their final names:
+# "file" after every file, "batch" every FSYNC_BATCH_FILES files or FSYNC_BATCH_BYTES bytes, "job" once at the end.
+FSYNC_POLICIES = ["file", "batch", "job"]
+
+
+# Returns the hidden temporary name a copy is written under until it is complete and on disk.
+def staging_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.part")
+
+
+# Flushes a file's data to disk. The file is opened read-only, so a copy that is already read-only can
+# still be flushed; Windows needs write access to flush a file.
+def fsync_file(path):
+    descriptor = os.open(path, os.O_RDWR if os.name == "nt" else os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+# Flushes a directory entry table to disk, making renames inside it durable.
+# Windows cannot open directories; NTFS journals renames itself.
+def fsync_directory(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+# The StagedCommitter class moves verified copies from their staging names to their final names.
+# A file only ever appears under its final name once all of its data is on disk, so a power loss can
+# leave a hidden .part file behind but never a truncated file under a valid-looking name.
+# Files are committed in batches according to the fsync policy: each file still unsynced is fsynced,
+# renamed into place with os.replace (followed by its staged checksum sidecar, if any), given the source's
+# permission bits to match shutil.copy, and each directory touched is fsynced once per batch rather
+# than once per file. on_commit(task) is called for every task once it is durable, and on_batch()
+# once after the on_commit calls of each batch, so the caller can make its own records durable per batch.
+# on_batch_start(tasks) is called with each batch before any of it is renamed into place. The time spent
+# committing is added to each task's "fsync" timing, the directory fsyncs shared out over the batch.
+class StagedCommitter:
+    def __init__(self, on_commit, on_failure, policy=FSYNC_POLICY, batch_files=FSYNC_BATCH_FILES,
+                 batch_bytes=FSYNC_BATCH_BYTES, on_batch=None, on_batch_start=None):
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {policy}")
+        self.policy = policy
+        self.batch_files = max(1, batch_files)
+        self.batch_bytes = batch_bytes
+        self.on_commit = on_commit  # Called as on_commit(task) once a task's copies are in place
+        self.on_failure = on_failure  # Called as on_failure(task, path, error) when a destination cannot be committed
+        self.on_batch = on_batch  # Called as on_batch() once a batch has been committed and announced
+        self.on_batch_start = on_batch_start  # Called as on_batch_start(tasks) before a batch is renamed into place
+        self.fsync_seconds = 0.0  # Time spent committing so far, summed over every batch
+        self._pending = []  # Verified tasks waiting for the next commit
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+    # True if a task's copies must be on disk before add() returns, so the copy should fsync them itself.
+    @property
+    def syncs_each_file(self):
+        return self.policy == "file"
+
+    # Queues a verified task and commits the batch if the policy says it is full.
+    def add(self, task):
+        with self._lock:
+            self._pending.append(task)
+            self._pending_bytes += task.size
+            if self.policy == "job":
+                return
+            if self.policy == "batch" and len(self._pending) < self.batch_files and self._pending_bytes < self.batch_bytes:
+                return
+            batch = self._take()
+        self._commit(batch)
+
+    # Commits every queued task, e.g. at the end of a job.
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        self._commit(batch)
+
+    def _take(self):
+        batch = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        return batch
+
+    # Syncs, renames and announces a batch. A failing destination is dropped through on_failure; the first
+    # error that leaves a task without any destination is raised once the rest of the batch is committed.
+    def _commit(self, batch):
+        if not batch:
+            return
+        if self.on_batch_start:
+            self.on_batch_start(batch)
+        directories = set()
+        committed = []
+        error = None
+        batch_started = time.perf_counter()
+        for task in batch:
+            started = time.perf_counter()
+            try:
+                for path in task.healthy:
+                    try:
+                        staged = staging_path(path)
+                        if not task.synced:
+                            fsync_file(staged)
+                        os.replace(staged, path)
+                        directories.add(os.path.dirname(path))
+                        try:
+                            shutil.copymode(task.source, path)
+                        except OSError as e:
+                            logging.warning(f"Could not copy the permissions of {task.source} to {path}: {e}")
+                        sidecar = task.sidecars.get(path)
+                        if sidecar:
+                            fsync_file(staging_path(sidecar))
+                            os.replace(staging_path(sidecar), sidecar)
+                    except OSError as e:
+                        self.on_failure(task, path, e)
+            except Exception as e:
+                error = error or e
+                continue
+            finally:
+                task.timings["fsync"] += time.perf_counter() - started
+            committed.append(task)
+        started = time.perf_counter()
+        for directory in directories:
+            try:
+                fsync_directory(directory)
+            except OSError as e:
+                logging.warning(f"Could not flush directory {directory} to disk: {e}")
+        if committed:
+            share = (time.perf_counter() - started) / len(committed)
+            for task in committed:
+                task.timings["fsync"] += share
+        with self._lock:
+            self.fsync_seconds += time.perf_counter() - batch_started
+        logging.debug(f"Committed {len(committed)} files to {len(directories)} directories")
+        for task in committed:
+            self.on_commit(task)
+        if committed and self.on_batch:
+            self.on_batch()
+        if error:
+            raise error
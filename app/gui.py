@@ -1,25 +1,48 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QLabel, QLineEdit, QComboBox, QPushButton, QVBoxLayout, QPlainTextEdit,
-    QProgressBar, QWidget, QFileDialog, QHBoxLayout, QDateEdit, QMessageBox
+    QProgressBar, QWidget, QFileDialog, QHBoxLayout, QDateEdit, QMessageBox,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, QApplication, QCheckBox
 )
-from PyQt5.QtCore import QDate
+from PyQt5.QtCore import QDate, Qt, QTimer
 import logging
-import os
-import json
 import re
 from app.config import (
-    SETTINGS_FILE, LOG_FILE, VALID_FILE_EXTENSIONS,
+    VALID_FILE_EXTENSIONS,
     DEFAULT_MEDIA_TYPE, DEFAULT_CAPTURE_DATE_FORMAT,
-    APP_NAME, VERSION, CAMERA_NUMBER_PATTERN, SCENE_NUMBER_PATTERN
+    APP_NAME, VERSION, CAMERA_NUMBER_PATTERN, SCENE_NUMBER_PATTERN,
+    HASH_ALGORITHM, VERIFY_MODE
 )
-from app.threads import BatchProcessThread
+from app.checksums import available_algorithms, VERIFY_MODES
+from app.scheduler import JobScheduler, COMPLETED, FAILED, CANCELLED, RUNNING
 from app.consolehandler import LogHandler
+from app.logqueue import start_logging
+from app.settings import read_settings, update_settings
+from app import startup
+
+
+# Columns of the job queue table.
+JOB_COLUMNS = ["Job", "Camera", "Scene", "Import Path", "Status", "Progress", "Speed", "ETA"]
+PROGRESS_COLUMN = JOB_COLUMNS.index("Progress")
+
+
+# Formats an ETA in seconds as h:mm:ss, or dashes while it is unknown.
+def format_eta(seconds):
+    if seconds < 0:
+        return "--:--:--"
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
 
 
 class MediaIngestGUI(QMainWindow):
     def __init__(self):
         # Initialises the Media Ingest GUI and loads settings
         super().__init__()
+        # Job queue state: the scheduler decides which jobs run, threads and stats are keyed by job id
+        self.scheduler = JobScheduler()
+        self.threads = {}
+        self.preview_thread = None  # Planning thread of the running preview, if any
+        self.job_stats = {}  # job id -> (percent, MB/s, ETA seconds)
         self.init_logging()
         self.init_ui()
 
@@ -32,8 +55,37 @@ class MediaIngestGUI(QMainWindow):
         self.camera_number = ""
         self.scene_number = ""
 
-        # Load settings from previous session, if available
-        self.load_settings()
+        # Load settings from previous session, if available, once the event loop runs
+        self.painted = False  # True once the window has been painted for the first time
+        self.settings_loaded = False
+        QTimer.singleShot(0, self.finish_startup)
+
+    def paintEvent(self, event):
+        # Records when the window is first painted, for the start-up report.
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            startup.mark("first paint")
+            self.report_startup()
+
+    def finish_startup(self):
+        # Runs from the event loop once the window is shown: everything that reads from disk or probes
+        # optional packages is done here so it does not delay the window appearing.
+        self.hash_algorithm_dropdown.clear()
+        self.hash_algorithm_dropdown.addItems(available_algorithms())
+        self.hash_algorithm_dropdown.setCurrentText(HASH_ALGORITHM)
+        try:
+            self.load_settings()
+        except Exception as e:
+            logging.warning(f"Could not load settings: {e}")
+        startup.mark("settings")
+        self.settings_loaded = True
+        self.report_startup()
+
+    def report_startup(self):
+        # Logs the start-up report once the window has been painted and the settings are loaded, in either order.
+        if self.painted and self.settings_loaded:
+            startup.report()
 
     def init_logging(self):
         # Sets up logging for file and GUI console output.
@@ -41,18 +93,9 @@ class MediaIngestGUI(QMainWindow):
         self.log_console = QPlainTextEdit()
         self.log_console.setReadOnly(True)
 
-        # Create file and GUI log handlers
-        file_handler = logging.FileHandler(LOG_FILE)
-        file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-
-        gui_handler = LogHandler(self.log_console)  # Custom handler for GUI logging
-        gui_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-
-        # Configure the root logger
-        root_logger = logging.getLogger()
-        root_logger.setLevel(logging.DEBUG)  # Log level can be adjusted
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(gui_handler)
+        # Show log output in the console. Records reach it through the queue-based logging pipeline,
+        # which also writes the log file, so no logging work happens on the copy threads.
+        start_logging(LogHandler(self.log_console))
 
         # Log application startup
         logging.info(f"Starting {APP_NAME} v{VERSION}")
@@ -89,11 +132,15 @@ class MediaIngestGUI(QMainWindow):
         export_layout = QHBoxLayout()
         self.export_label = QLabel("Export Path:")
         self.export_path_input = QLineEdit()
+        self.export_path_input.setPlaceholderText("Separate several destinations with ;")
         self.export_browse_button = QPushButton("Browse")
         self.export_browse_button.clicked.connect(self.browse_export_path)
+        self.export_add_button = QPushButton("Add")
+        self.export_add_button.clicked.connect(self.add_export_path)
         export_layout.addWidget(self.export_label)
         export_layout.addWidget(self.export_path_input)
         export_layout.addWidget(self.export_browse_button)
+        export_layout.addWidget(self.export_add_button)
         main_layout.addLayout(export_layout)
 
         # Media Type and Capture Date selection
@@ -129,12 +176,65 @@ class MediaIngestGUI(QMainWindow):
         camera_scene_layout.addWidget(self.scene_number_input)
         main_layout.addLayout(camera_scene_layout)
 
-        # Activate button and progress bar
-        self.activate_button = QPushButton("Activate")
+        # Checksum algorithm and verification mode selection
+        verify_layout = QHBoxLayout()
+        self.hash_algorithm_label = QLabel("Checksum:")
+        self.hash_algorithm_dropdown = QComboBox()
+        self.hash_algorithm_dropdown.addItems([HASH_ALGORITHM])  # The installed algorithms are filled in by finish_startup
+        self.verify_mode_label = QLabel("Verification:")
+        self.verify_mode_dropdown = QComboBox()
+        self.verify_mode_dropdown.addItems(VERIFY_MODES)
+        self.verify_mode_dropdown.setCurrentText(VERIFY_MODE)
+        verify_layout.addWidget(self.hash_algorithm_label)
+        verify_layout.addWidget(self.hash_algorithm_dropdown)
+        verify_layout.addWidget(self.verify_mode_label)
+        verify_layout.addWidget(self.verify_mode_dropdown)
+        self.skip_ingested_checkbox = QCheckBox("Skip files already ingested")
+        self.skip_ingested_checkbox.setChecked(True)
+        verify_layout.addWidget(self.skip_ingested_checkbox)
+        main_layout.addLayout(verify_layout)
+
+        # Preview and activate buttons, and the overall progress bar for the whole queue
+        action_layout = QHBoxLayout()
+        self.preview_button = QPushButton("Preview")
+        self.preview_button.clicked.connect(self.preview_batch_process)
+        self.activate_button = QPushButton("Add to Queue")
         self.activate_button.clicked.connect(self.start_batch_process)
-        main_layout.addWidget(self.activate_button)
+        action_layout.addWidget(self.preview_button)
+        action_layout.addWidget(self.activate_button)
+        main_layout.addLayout(action_layout)
+        progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
-        main_layout.addWidget(self.progress_bar)
+        self.throughput_label = QLabel("-- MB/s")
+        self.eta_label = QLabel("ETA --:--:--")
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.throughput_label)
+        progress_layout.addWidget(self.eta_label)
+        main_layout.addLayout(progress_layout)
+
+        # Job queue with per-job progress
+        self.job_table = QTableWidget(0, len(JOB_COLUMNS))
+        self.job_table.setHorizontalHeaderLabels(JOB_COLUMNS)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.job_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(JOB_COLUMNS.index("Import Path"), QHeaderView.Stretch)
+        main_layout.addWidget(self.job_table)
+
+        # Queue controls acting on the selected job
+        queue_layout = QHBoxLayout()
+        for label, handler in [
+            ("Pause", self.pause_selected_job),
+            ("Resume", self.resume_selected_job),
+            ("Cancel", self.cancel_selected_job),
+            ("Move Up", lambda: self.move_selected_job(-1)),
+            ("Move Down", lambda: self.move_selected_job(1)),
+        ]:
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            queue_layout.addWidget(button)
+        main_layout.addLayout(queue_layout)
 
         # Console Window
         main_layout.addWidget(self.log_console)
@@ -156,6 +256,13 @@ class MediaIngestGUI(QMainWindow):
         if path:
             self.export_path_input.setText(path)
 
+    def add_export_path(self):
+        # Opens a dialog to add another export directory; every file is copied to all of them.
+        path = QFileDialog.getExistingDirectory(self, "Add Export Directory")
+        if path:
+            paths = [text for text in self.export_path_input.text().split(";") if text.strip()]
+            self.export_path_input.setText(";".join(paths + [path]))
+
     def format_camera_number(self):
         # Ensures the camera number matches the required pattern.
         text = self.camera_number_input.text()
@@ -184,34 +291,218 @@ class MediaIngestGUI(QMainWindow):
         else:
             self.scene_number_input.setStyleSheet("")
 
-    def start_batch_process(self):
-        # Validates input and starts the batch process.
-        logging.info("Activate button pressed.")
+    def build_job(self):
+        # Validates input and returns an IngestJob for the current card, or None if a field is missing.
+        if not self.project_name_input.text() or not self.import_path_input.text() or not self.export_path_input.text():
+            QMessageBox.warning(self, "Validation Error", "All fields must be filled.")
+            return None
+        logging.debug("Validation passed.")
+        from app.ingest import IngestJob  # Imported on first use to keep the ingest core out of GUI startup
+
+        return IngestJob(
+            self.import_path_input.text(),
+            self.export_path_input.text(),
+            self.project_name_input.text(),
+            self.media_type_dropdown.currentText(),
+            self.capture_date_selector.date().toString(DEFAULT_CAPTURE_DATE_FORMAT),
+            self.camera_number_input.text(),
+            self.scene_number_input.text(),
+            hash_algorithm=self.hash_algorithm_dropdown.currentText(),
+            verify_mode=self.verify_mode_dropdown.currentText(),
+            skip_ingested=self.skip_ingested_checkbox.isChecked(),
+        )
+
+    def preview_batch_process(self):
+        # Shows the rename/copy plan and the pre-flight checks for the current card without touching any file.
+        # Planning scans the card, so it runs on a worker thread and the result is shown when it is ready.
+        from app.threads import PreviewThread
+
+        logging.info("Preview button pressed.")
         try:
-            if not self.project_name_input.text() or not self.import_path_input.text() or not self.export_path_input.text():
-                QMessageBox.warning(self, "Validation Error", "All fields must be filled.")
+            job = self.build_job()
+            if job is None:
                 return
+        except Exception as e:
+            logging.error(f"Error during preview: {e}", exc_info=True)
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.preview_button.setEnabled(False)
+        QApplication.setOverrideCursor(Qt.BusyCursor)
+        self.preview_thread = PreviewThread(job)
+        self.preview_thread.preview_ready.connect(self.show_preview)
+        self.preview_thread.error_occurred.connect(lambda msg: QMessageBox.critical(self, "Error", msg))
+        self.preview_thread.finished.connect(self.preview_finished)
+        self.preview_thread.start()
+
+    def preview_finished(self):
+        # Re-enables the Preview button once the planning thread has stopped.
+        QApplication.restoreOverrideCursor()
+        self.preview_button.setEnabled(True)
+        self.preview_thread = None
+
+    def show_preview(self, entries, report):
+        # Shows the plan and pre-flight report of a preview.
+        message = QMessageBox(self)
+        message.setIcon(QMessageBox.Information if report.ok else QMessageBox.Warning)
+        message.setWindowTitle("Preview")
+        message.setText("\n".join(report.lines()))
+        message.setDetailedText("\n".join(f"{entry.source} -> {entry.name}" for entry in entries))
+        message.exec_()
 
-            logging.debug("Validation passed. Starting the batch process.")
-            self.thread = BatchProcessThread(
-                self.import_path_input.text(),
-                self.export_path_input.text(),
-                self.project_name_input.text(),
-                self.media_type_dropdown.currentText(),
-                self.capture_date_selector.date().toString(DEFAULT_CAPTURE_DATE_FORMAT),
-                self.camera_number_input.text(),
-                self.scene_number_input.text()
-            )
-            self.thread.progress_updated.connect(self.progress_bar.setValue)
-            self.thread.completed.connect(lambda: QMessageBox.information(self, "Success", "Process completed!"))
-            self.thread.error_occurred.connect(lambda msg: QMessageBox.critical(self, "Error", msg))
-            self.thread.start()
+    def start_batch_process(self):
+        # Validates input and adds a job for the current card to the queue.
+        logging.info("Add to Queue button pressed.")
+        try:
+            job = self.build_job()
+            if job is None:
+                return
+            logging.debug("Queueing the batch process.")
+            queued = self.scheduler.add(job)
+            self.job_stats[queued.id] = (0, 0.0, -1)
+            self.save_settings()
+            self.schedule_jobs()
         except Exception as e:
             logging.error(f"Error during batch process setup: {e}", exc_info=True)
             QMessageBox.critical(self, "Error", str(e))
 
+    def schedule_jobs(self):
+        # Starts a worker thread for every queued job the scheduler allows to run now.
+        from app.threads import BatchProcessThread
+
+        for queued in self.scheduler.start_runnable():
+            thread = BatchProcessThread(queued.job, queued.control)
+            job_id = queued.id
+            thread.progress_updated.connect(lambda value, job_id=job_id: self.update_job_stats(job_id, percent=value))
+            thread.throughput_updated.connect(lambda value, job_id=job_id: self.update_job_stats(job_id, rate=value))
+            thread.eta_updated.connect(lambda value, job_id=job_id: self.update_job_stats(job_id, eta=value))
+            thread.completed.connect(lambda job_id=job_id: self.job_finished(job_id, COMPLETED))
+            thread.cancelled.connect(lambda job_id=job_id: self.job_finished(job_id, CANCELLED))
+            thread.error_occurred.connect(lambda msg, job_id=job_id: self.job_finished(job_id, FAILED, msg))
+            thread.destination_failed.connect(
+                lambda directory, msg, job_id=job_id: self.destination_failed(job_id, directory, msg)
+            )
+            # Keep the thread referenced until Qt reports it has fully stopped.
+            thread.finished.connect(lambda job_id=job_id: self.threads.pop(job_id, None))
+            self.threads[job_id] = thread
+            thread.start()
+        self.refresh_job_table()
+
+    def job_finished(self, job_id, state, message=None):
+        # Records the outcome of a job and starts whatever was waiting for its devices.
+        self.scheduler.finish(job_id, state)
+        if state == FAILED:
+            QMessageBox.critical(self, "Error", f"Job {job_id} failed: {message}")
+        self.schedule_jobs()
+        if self.scheduler.idle():
+            self.update_overall_progress()
+            QMessageBox.information(self, "Success", "All queued jobs finished.")
+
+    def destination_failed(self, job_id, directory, message):
+        # Warns that one export destination was dropped; the job keeps copying to the others.
+        QMessageBox.warning(
+            self, "Destination Failed",
+            f"Job {job_id} stopped copying to {directory}: {message}\nThe other destinations are still being written."
+        )
+
+    def update_job_stats(self, job_id, percent=None, rate=None, eta=None):
+        # Updates one job's row with its latest progress signals, then the overall progress.
+        old_percent, old_rate, old_eta = self.job_stats.get(job_id, (0, 0.0, -1))
+        stats = (
+            old_percent if percent is None else percent,
+            old_rate if rate is None else rate,
+            old_eta if eta is None else eta,
+        )
+        self.job_stats[job_id] = stats
+        row = self.job_row(job_id)
+        if row is not None:
+            self.job_table.cellWidget(row, PROGRESS_COLUMN).setValue(stats[0])
+            self.job_table.item(row, JOB_COLUMNS.index("Speed")).setText(f"{stats[1]:.1f} MB/s")
+            self.job_table.item(row, JOB_COLUMNS.index("ETA")).setText(format_eta(stats[2]))
+        self.update_overall_progress()
+
+    def update_overall_progress(self):
+        # Shows the average progress of all jobs that were not cancelled, the combined
+        # throughput of running jobs and the longest remaining ETA next to the progress bar.
+        jobs = [queued for queued in self.scheduler.jobs if queued.state != CANCELLED]
+        running = [queued for queued in jobs if queued.state == RUNNING]
+        if jobs:
+            self.progress_bar.setValue(int(sum(self.job_stats[queued.id][0] for queued in jobs) / len(jobs)))
+        self.update_throughput(sum(self.job_stats[queued.id][1] for queued in running))
+        self.update_eta(max((self.job_stats[queued.id][2] for queued in running), default=-1))
+
+    def refresh_job_table(self):
+        # Rebuilds the queue table in scheduler order, keeping the selected job selected.
+        selected = self.selected_job_id()
+        self.job_table.setRowCount(0)
+        for queued in self.scheduler.jobs:
+            row = self.job_table.rowCount()
+            self.job_table.insertRow(row)
+            percent, rate, eta = self.job_stats[queued.id]
+            values = [str(queued.id), queued.job.camera_number, queued.job.scene_number, queued.job.import_path,
+                      queued.state, "", f"{rate:.1f} MB/s", format_eta(eta)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, queued.id)
+                self.job_table.setItem(row, column, item)
+            progress = QProgressBar()
+            progress.setValue(percent)
+            self.job_table.setCellWidget(row, PROGRESS_COLUMN, progress)
+            if queued.id == selected:
+                self.job_table.selectRow(row)
+
+    def job_row(self, job_id):
+        # Returns the table row showing a job, or None.
+        for row in range(self.job_table.rowCount()):
+            if self.job_table.item(row, 0).data(Qt.UserRole) == job_id:
+                return row
+        return None
+
+    def selected_job_id(self):
+        # Returns the id of the job selected in the queue table, or None.
+        row = self.job_table.currentRow()
+        if row < 0 or self.job_table.item(row, 0) is None:
+            return None
+        return self.job_table.item(row, 0).data(Qt.UserRole)
+
+    def pause_selected_job(self):
+        # Pauses the selected job; a running job stops between copy chunks.
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.pause(job_id)
+            self.refresh_job_table()
+
+    def resume_selected_job(self):
+        # Resumes the selected paused job.
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.resume(job_id)
+            self.schedule_jobs()
+
+    def cancel_selected_job(self):
+        # Cancels the selected job. Running jobs stop at their next checkpoint and can be queued again later
+        # with the same settings to resume where they stopped.
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.cancel(job_id)
+            self.schedule_jobs()
+
+    def move_selected_job(self, offset):
+        # Moves the selected job up or down the queue.
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.move(job_id, offset)
+            self.refresh_job_table()
+
+    def update_throughput(self, mb_per_second):
+        # Shows the live copy throughput next to the progress bar.
+        self.throughput_label.setText(f"{mb_per_second:.1f} MB/s")
+
+    def update_eta(self, seconds):
+        # Shows the estimated time remaining next to the progress bar.
+        self.eta_label.setText(f"ETA {format_eta(seconds)}")
+
     def save_settings(self):
-        # Saves current GUI inputs to a settings file.
+        # Saves current GUI inputs to a settings file. Called when a job is queued and when the window closes.
         settings = {
             "project_name": self.project_name_input.text(),
             "import_path": self.import_path_input.text(),
@@ -221,21 +512,27 @@ class MediaIngestGUI(QMainWindow):
             "camera_number": self.camera_number_input.text(),
             "scene_number": self.scene_number_input.text(),
         }
-        with open(SETTINGS_FILE, "w") as file:
-            json.dump(settings, file)
+        try:
+            update_settings(settings)
+        except OSError as e:
+            logging.warning(f"Could not save settings: {e}")
+
+    def closeEvent(self, event):
+        # Remembers the current inputs for the next session before the window closes.
+        self.save_settings()
+        super().closeEvent(event)
 
     def load_settings(self):
         # Loads previous GUI inputs from a settings file.
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, "r") as file:
-                settings = json.load(file)
-                self.project_name_input.setText(settings.get("project_name", ""))
-                self.import_path_input.setText(settings.get("import_path", ""))
-                self.export_path_input.setText(settings.get("export_path", ""))
-                self.media_type_dropdown.setCurrentText(settings.get("media_type", DEFAULT_MEDIA_TYPE))
-                self.capture_date_selector.setDate(QDate.fromString(settings.get("capture_date", ""), DEFAULT_CAPTURE_DATE_FORMAT))
-                self.camera_number_input.setText(settings.get("camera_number", ""))
-                self.scene_number_input.setText(settings.get("scene_number", ""))
+        settings = read_settings()
+        if settings:
+            self.project_name_input.setText(settings.get("project_name", ""))
+            self.import_path_input.setText(settings.get("import_path", ""))
+            self.export_path_input.setText(settings.get("export_path", ""))
+            self.media_type_dropdown.setCurrentText(settings.get("media_type", DEFAULT_MEDIA_TYPE))
+            self.capture_date_selector.setDate(QDate.fromString(settings.get("capture_date", ""), DEFAULT_CAPTURE_DATE_FORMAT))
+            self.camera_number_input.setText(settings.get("camera_number", ""))
+            self.scene_number_input.setText(settings.get("scene_number", ""))
 
     def handle_batch_error(self, msg):
         # Logs and displays any errors from the batch process.
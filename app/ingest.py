@@ -0,0 +1,433 @@
+import os
+import logging
+import time
+from datetime import datetime
+from app.config import (
+    VALID_FILE_EXTENSIONS, SIDECAR_EXTENSIONS, HASH_ALGORITHM, VERIFY_MODE, MANIFEST_FORMAT
+)
+from app.copyengine import CopyEngine, CopyTask
+from app.durable import staging_path
+from app.progress import ProgressTracker
+from app.checksums import new_hasher
+from app.manifest import write_manifest
+from app.journal import IngestJournal, JournalEntry
+from app.preflight import PreflightError, check_plan
+from app.ingestindex import IngestIndex, fingerprint
+from app.scanner import scan_media
+from app.clips import group_clips
+from app.metrics import JobMetrics
+from app.control import JobControl, IngestCancelled
+
+
+# Splits an export path field into its destinations. Several destinations are separated by ";".
+def split_destinations(export_path):
+    if isinstance(export_path, str):
+        export_path = export_path.split(";")
+    return [os.path.normpath(path.strip()) for path in export_path if path.strip()]
+
+
+# The IngestReporter class receives events from a running ingest.
+# Frontends (the GUI thread, the command line) subclass it and override what they need;
+# methods may be called from copy worker threads.
+class IngestReporter:
+    # Called with overall byte progress, throughput in bytes/s and ETA in seconds (-1 if unknown).
+    def progress(self, done_bytes, total_bytes, rate, eta):
+        pass
+
+    # Called with the PreflightReport once the plan has been checked, before any file is touched.
+    def preflight(self, report):
+        pass
+
+    # Called with the CopyTask of each file once it has been copied and verified.
+    def file_completed(self, task):
+        pass
+
+    # Called once for each export directory dropped after a failure; the ingest continues on the others.
+    def destination_failed(self, directory, message):
+        pass
+
+
+# The IngestJob class holds the rename/copy/verify pipeline, independent of any user interface.
+# It is shared by BatchProcessThread in the GUI and the headless command line.
+class IngestJob:
+    def __init__(self, import_path, export_path, project_name, media_type, capture_date, camera_number, scene_number,
+                 hash_algorithm=HASH_ALGORITHM, verify_mode=VERIFY_MODE, manifest_format=MANIFEST_FORMAT,
+                 skip_ingested=True):
+        self.import_path = import_path  # Path to import files from
+        self.export_paths = split_destinations(export_path)  # Directories every file is copied to
+        self.export_path = self.export_paths[0] if self.export_paths else ""  # Primary export directory
+        self.project_name = project_name  # Name of the project
+        self.media_type = media_type  # Type of media (e.g., Video, Audio, Images)
+        self.capture_date = capture_date  # Date when the files were captured (dd/mm/yyyy)
+        self.camera_number = camera_number  # Camera number used for the capture
+        self.scene_number = scene_number  # Scene number of the media
+        self.hash_algorithm = hash_algorithm  # Checksum algorithm used to verify copies
+        self.verify_mode = verify_mode  # How copies are confirmed against their checksum
+        self.manifest_format = manifest_format  # Format of the per-batch checksum manifest
+        self.skip_ingested = skip_ingested  # Leave out files the ingest index says this project already has
+        self.timings = {}  # Seconds spent in each phase of the last run (scan, preflight, plan, rename, transfer, ...)
+        self.metrics = JobMetrics()  # Structured measurements of the running job; off until run() starts
+
+    # Runs the whole ingest: scanning, filtering, pre-flight checks, renaming, parallel copying with
+    # verification and the manifest. A plan that fails its pre-flight checks raises PreflightError
+    # before anything has been renamed or copied.
+    # Every step is recorded in a job journal so an interrupted ingest can be resumed by running it again.
+    # control (a JobControl) can pause or cancel the run from another thread; a cancelled run drains its
+    # copies in flight, rolls back the files it did not finish and raises IngestCancelled. Its journal is
+    # left behind, so running the job again skips the files already copied and picks up the rest.
+    # Raises on failure; returns the paths of the manifests written (one per healthy destination), which is
+    # empty when every clip on the card was already ingested and there is nothing new to copy.
+    def run(self, reporter=None, control=None):
+        reporter = reporter or IngestReporter()
+        control = control or JobControl()
+        self.timings = {}
+        run_started = time.perf_counter()
+        logging.info("Batch process started.")
+        logging.debug(f"Parameters: Import Path: {self.import_path}, Export Path: {self.export_path}, "
+                      f"Project Name: {self.project_name}, Media Type: {self.media_type}, "
+                      f"Capture Date: {self.capture_date}, Camera Number: {self.camera_number}, "
+                      f"Scene Number: {self.scene_number}")
+
+        if not self.export_paths:
+            raise ValueError("No export path given.")
+
+        # Fail early if the selected checksum algorithm is not available.
+        new_hasher(self.hash_algorithm)
+        formatted_capture_date = datetime.strptime(self.capture_date, "%d/%m/%Y").strftime("%Y%m%d")
+
+        # Resume an interrupted job with the same parameters, or plan a new one.
+        journal = IngestJournal.for_job(self.job_params())
+        self.metrics = JobMetrics(journal.job_id, self.project_name)
+        index = IngestIndex()
+        status = "failed"
+        try:
+            while True:
+                import_date, entries, report = self.plan(journal, formatted_capture_date, index)
+                reporter.preflight(report)
+                if not report.ok:
+                    raise PreflightError(report)
+                if not entries:
+                    logging.info("Nothing new to copy.")
+                    status = "completed"
+                    return []
+                started = time.perf_counter()
+                claimed = self.claim_numbers(journal, index, entries)
+                self.add_timing("plan", started)
+                if claimed:
+                    break
+                logging.info("File numbers were taken by another job while planning; planning again.")
+            started = time.perf_counter()
+            if not journal.resumable:
+                journal.start(self.job_params(), import_date)
+            self.record_plan(journal, entries)
+            self.add_timing("plan", started)
+            manifest_paths = self.process_job(journal, formatted_capture_date, import_date, reporter, control, index)
+            status = "completed"
+        except IngestCancelled:
+            status = "cancelled"
+            raise
+        finally:
+            journal.close()
+            index.close()
+            self.metrics.finish(status, time.perf_counter() - run_started, self.timings)
+
+        logging.info("Batch processing completed successfully.")
+        return manifest_paths
+
+    # Builds the plan and runs the pre-flight checks without renaming, copying or journaling anything.
+    # Returns (planned journal entries, PreflightReport) for a dry run.
+    def preview(self):
+        formatted_capture_date = datetime.strptime(self.capture_date, "%d/%m/%Y").strftime("%Y%m%d")
+        journal = IngestJournal.for_job(self.job_params())
+        index = IngestIndex()
+        try:
+            _, entries, report = self.plan(journal, formatted_capture_date, index)
+        finally:
+            index.close()
+        return entries, report
+
+    # Plans the job, continuing the plan of an interrupted run from its journal, and checks it.
+    # Returns (import date, planned entries, PreflightReport).
+    def plan(self, journal, formatted_capture_date, index):
+        started = time.perf_counter()
+        if journal.resumable:
+            logging.info(f"Resuming interrupted job from journal: {journal.path}")
+            import_date = journal.import_date
+            entries = self.plan_entries(journal, formatted_capture_date, import_date, index)
+        else:
+            import_date = datetime.now().strftime("%Y%m%d")
+            entries = self.plan_entries(None, formatted_capture_date, import_date, index)
+        started = self.add_timing("scan", started)
+        report = check_plan(entries, self.import_path, self.export_paths)
+        self.add_timing("preflight", started)
+        report.log()
+        return import_date, entries, report
+
+    # Adds the time since started (a time.perf_counter() value) to a phase and returns the current time.
+    def add_timing(self, phase, started):
+        now = time.perf_counter()
+        self.record_timing(phase, now - started)
+        return now
+
+    # Adds seconds to a phase of this run and records them in the job metrics.
+    def record_timing(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+        self.metrics.phase(phase, seconds)
+
+    # Returns the parameters that identify this job, used to find its journal on a later run.
+    def job_params(self):
+        return {
+            "import_path": os.path.abspath(self.import_path),
+            "export_paths": [os.path.abspath(path) for path in self.export_paths],
+            "project_name": self.project_name,
+            "media_type": self.media_type,
+            "capture_date": self.capture_date,
+            "camera_number": self.camera_number,
+            "scene_number": self.scene_number,
+        }
+
+    # Returns where the source of a journal entry lives once it has been renamed in place.
+    def renamed_path(self, entry):
+        return os.path.join(os.path.dirname(entry.source), entry.name)
+
+    # Returns a journal entry for every file in the job, in index order, without touching any file.
+    # Files are grouped into clips (media plus sidecars and spanned segments); every file of a clip
+    # shares its clip number. Entries recorded by an earlier run come first; if that run never finished
+    # planning, the scan continues and the new clips are numbered after them. A new job continues the
+    # project's clip numbering from the ingest index. New entries are not journaled yet.
+    # Clips whose files the ingest index already holds for this project are left out unless skip_ingested is off;
+    # if that leaves nothing, no entries are returned. A card without any matching file raises ValueError.
+    def plan_entries(self, journal, formatted_capture_date, import_date, ingest_index):
+        entries = sorted(journal.entries.values(), key=lambda entry: entry.index) if journal else []
+        if journal and journal.planned:
+            return entries
+
+        # Files already planned (under either name) were handled above.
+        known = {entry.source for entry in entries} | {self.renamed_path(entry) for entry in entries}
+        index = entries[-1].index if entries else 0
+        clip_number = max(entry.clip for entry in entries) if entries else ingest_index.next_index(self.project_name) - 1
+        skipped = 0
+        logging.info(f"Scanning directory: {self.import_path}")
+        extensions = VALID_FILE_EXTENSIONS.get(self.media_type, set()) | SIDECAR_EXTENSIONS
+        files = (file for file in scan_media(os.path.abspath(self.import_path), extensions) if file[0] not in known)
+        for clip in group_clips(files):
+            if self.skip_ingested and all(
+                ingest_index.ingested_name(self.project_name, member.path, member.size, member.mtime_ns)
+                for member in clip.members
+            ):
+                logging.debug(f"Skipping {clip.members[0].path}: already ingested")
+                skipped += 1
+                continue
+            clip_number += 1
+            for member in clip.members:
+                index += 1
+                # Generate the new file name based on the naming convention.
+                new_name = (
+                    f"{self.project_name}-C{formatted_capture_date}-CM{self.camera_number}-"
+                    f"S{self.scene_number}-I{import_date}-{clip_number:04d}{member.suffix}{member.extension}"
+                )
+                entries.append(JournalEntry(index, member.path, new_name, member.size, clip_number))
+        if skipped:
+            logging.info(f"Skipped {skipped} clips already ingested for project {self.project_name}.")
+        if not entries:
+            if skipped:
+                # A card inserted again with nothing new on it: a normal outcome of an incremental ingest.
+                logging.info(f"All {skipped} clips were already ingested for project {self.project_name}.")
+                return entries
+            # Raise an error if no valid files are found.
+            raise ValueError(f"No files matching {self.media_type} extensions found.")
+        logging.info(f"Total files to process: {len(entries)} in {len({entry.clip for entry in entries})} clips")
+        return entries
+
+    # Takes the project clip numbers used by newly planned entries in the ingest index.
+    # Returns False if another job took some of them first; a resumed job keeps the numbers it already has.
+    def claim_numbers(self, journal, ingest_index, entries):
+        if journal.resumable:
+            ingest_index.advance(self.project_name, max(entry.clip for entry in entries))
+            return True
+        return ingest_index.claim(self.project_name, entries[0].clip, entries[-1].clip)
+
+    # Records the whole plan in the journal, made durable by a single fsync before any file is renamed,
+    # so a crash can never lose track of a file.
+    def record_plan(self, journal, entries):
+        if journal.planned:
+            return
+        for entry in entries:
+            if entry.index not in journal.entries:
+                journal.append("planned", sync=False, index=entry.index, source=entry.source, name=entry.name,
+                               size=entry.size, clip=entry.clip)
+        journal.append("plan_complete")
+
+    # Renames a planned file in place (unless a previous run already did) and returns its copy task.
+    # Work finished by a previous run is carried over: verified files keep their digest and
+    # partial copies resume from their last confirmed chunk.
+    def prepare_task(self, journal, entry):
+        renamed_path = self.renamed_path(entry)
+        if not entry.renamed:
+            if os.path.exists(entry.source):
+                logging.debug(f"Renaming file {entry.source} to {renamed_path}")
+                os.rename(entry.source, renamed_path)
+                logging.info(f"File renamed: {renamed_path}")
+            elif not os.path.exists(renamed_path):
+                raise ValueError(f"Source file is missing: {entry.source}")
+            journal.append("renamed", sync=False, index=entry.index)
+
+        task = CopyTask(entry.index, renamed_path, self.destination_paths(entry), entry.size)
+        if entry.digest:
+            # Already copied and verified by a previous run.
+            task.digest = entry.digest
+            task.verified = True
+            task.failed = dict(entry.failed)
+        else:
+            task.resume_offset = self.resume_offset(entry)
+        return task
+
+    # Returns the path of a planned file in every export directory.
+    def destination_paths(self, entry):
+        return [os.path.join(export_path, entry.name) for export_path in self.export_paths]
+
+    # Returns how far a previous run got with copying a file: its last confirmed chunk, if a staged copy
+    # is still there to continue from, or 0 if the file has to be copied from the start.
+    def resume_offset(self, entry):
+        if entry.offset and any(
+            os.path.exists(staging_path(path)) and os.path.getsize(staging_path(path)) >= entry.offset
+            for path in self.destination_paths(entry)
+        ):
+            return entry.offset
+        return 0
+
+    # Undoes the files a cancelled job did not finish, so the card and the export paths look as if they were
+    # never touched: their staged copies are deleted and their sources get their original names back.
+    # Files copied and verified before the cancellation (including those drained after it) stay in place.
+    # Each rollback is journaled, so running the job again renames and copies those files from the start.
+    def roll_back(self, journal, tasks):
+        started = time.perf_counter()
+        kept = restored = 0
+        for task in tasks:
+            entry = journal.entries[task.index]
+            if entry.digest:
+                kept += 1
+                continue
+            for path in task.destinations:
+                try:
+                    os.remove(staging_path(path))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"Could not remove partial copy {staging_path(path)}: {e}")
+            try:
+                if os.path.exists(entry.source):
+                    raise FileExistsError(f"{entry.source} already exists")
+                os.rename(task.source, entry.source)
+            except OSError as e:
+                logging.error(f"Could not restore the name of {task.source}: {e}")
+                continue
+            journal.append("rolled_back", sync=False, index=task.index)
+            restored += 1
+        journal.append("cancelled", restored=restored)
+        logging.info(f"Cancelled: {kept} files kept, {restored} files restored to their original names.")
+        self.add_timing("rollback", started)
+
+    # Renames and copies every planned file, skipping work a previous run already finished.
+    # Files are handed to the copy engine as they are renamed, so copying starts straight away.
+    def process_job(self, journal, formatted_capture_date, import_date, reporter, control, ingest_index):
+        for export_path in self.export_paths:
+            os.makedirs(export_path, exist_ok=True)
+        tasks = []
+        # The whole plan is known, so progress and ETA cover every file from the start; bytes copied by an
+        # earlier run of a resumed job count as done.
+        entries = journal.entries.values()
+        tracker = ProgressTracker(
+            sum(entry.size for entry in entries),
+            reporter.progress,
+            done_bytes=sum(entry.size if entry.digest else self.resume_offset(entry) for entry in entries),
+        )
+        start_time = time.time()
+
+        # Clips are copied largest first, each clip's files together, so long spanned recordings start
+        # early and the small clips at the end keep every worker busy.
+        clip_sizes = {}
+        for entry in entries:
+            clip_sizes[entry.clip] = clip_sizes.get(entry.clip, 0) + entry.size
+        order = sorted(entries, key=lambda entry: (-clip_sizes[entry.clip], entry.clip, entry.index))
+
+        renaming = {"seconds": 0.0}  # Time spent renaming sources in place, between handing out tasks
+
+        # Yields the tasks that still need copying.
+        def pending_tasks():
+            for entry in order:
+                control.checkpoint()
+                logging.debug(f"Processing file {entry.index}: {entry.source}")
+                started = time.perf_counter()
+                task = self.prepare_task(journal, entry)
+                renaming["seconds"] += time.perf_counter() - started
+                tasks.append(task)
+                if not task.verified:
+                    yield task
+
+        fingerprints = {}  # Task index -> fingerprint, taken while the source is still in the page cache
+
+        # Journals the files of a batch before they are renamed into place, so a resumed job knows the
+        # export files they leave behind are its own even if it stops before their verified records are synced.
+        def batch_committing(batch):
+            for task in batch:
+                journal.append("committing", sync=False, index=task.index)
+            journal.sync()
+
+        def file_done(task):
+            # Made durable with the rest of its batch by journal.sync, one fsync per committed batch.
+            journal.append("verified", sync=False, index=task.index, digest=task.digest, failed=task.failed)
+            fingerprints[task.index] = fingerprint(task.source)
+            self.metrics.file(task)
+            reporter.file_completed(task)
+
+        # Copy the renamed files to every export path in parallel, reporting byte-level progress.
+        engine = CopyEngine(algorithm=self.hash_algorithm, verify_mode=self.verify_mode, control=control)
+        started = time.perf_counter()
+        try:
+            engine.copy_all(
+                pending_tasks(),
+                on_file_done=file_done,
+                on_bytes=tracker.add,
+                on_checkpoint=lambda task, offset: journal.append("progress", index=task.index, offset=offset),
+                on_destination_failed=reporter.destination_failed,
+                on_batch_committing=batch_committing,
+                on_batch_committed=journal.sync,
+            )
+        except IngestCancelled:
+            self.add_timing("transfer", started)
+            self.roll_back(journal, tasks)
+            raise
+        tracker.finish()
+        started = self.add_timing("transfer", started)
+        self.record_timing("rename", renaming["seconds"])
+        # Worker time, summed over the copy workers; it can exceed the transfer time when several files copy at once.
+        # fsync time spent during a copy is also part of the copy time; commits of staged files only count as fsync.
+        for phase, seconds in engine.busy_seconds.items():
+            self.record_timing(phase, seconds)
+
+        # Record every copied file and its checksum in a manifest in each export directory that is still healthy.
+        # The clip number range keeps the manifests of incremental ingests on the same day apart.
+        manifest_name = (
+            f"{self.project_name}-C{formatted_capture_date}-CM{self.camera_number}-"
+            f"S{self.scene_number}-I{import_date}-{min(clip_sizes):04d}-{max(clip_sizes):04d}"
+        )
+        manifest_paths = []
+        for export_path in self.export_paths:
+            if export_path in engine.failed_destinations:
+                continue
+            files = [
+                (task, path) for task in tasks for path in task.healthy if os.path.dirname(path) == export_path
+            ]
+            manifest_path = write_manifest(export_path, manifest_name, files, self.hash_algorithm,
+                                           self.manifest_format, start_time, time.time())
+            logging.info(f"Manifest written: {manifest_path}")
+            manifest_paths.append(manifest_path)
+
+        # Remember what was ingested so the same files are skipped when the card comes back.
+        ingest_index.record(self.project_name, [
+            (fingerprints.get(task.index) or fingerprint(task.source), os.path.basename(task.source)) for task in tasks
+        ], time.time())
+        self.add_timing("manifest", started)
+        journal.finish()
+        return manifest_paths
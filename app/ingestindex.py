@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from app.config import INGEST_INDEX_FILE, FINGERPRINT_BYTES, ensure_log_dir
+
+
+# Returns a cheap fingerprint of a file: (size, mtime_ns, hash of its first and last sample_bytes).
+# Renaming a file keeps all three, so a renamed clip on a card still matches its original ingest.
+def fingerprint(path, size=None, mtime_ns=None, sample_bytes=FINGERPRINT_BYTES):
+    if size is None or mtime_ns is None:
+        stat_result = os.stat(path)
+        size, mtime_ns = stat_result.st_size, stat_result.st_mtime_ns
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        hasher.update(file.read(sample_bytes))
+        if size > sample_bytes:
+            file.seek(max(sample_bytes, size - sample_bytes))
+            hasher.update(file.read(sample_bytes))
+    return size, mtime_ns, hasher.hexdigest()
+
+
+# The IngestIndex class is a persistent SQLite index of every file ingested per project, and of the
+# last file number each project used. Lookups go through an index on (project, size, mtime), so a
+# file is only read to compute its content hash when a candidate with the same size and time exists.
+# Several jobs may use the index at once; each opens its own connection.
+class IngestIndex:
+    def __init__(self, path=INGEST_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()  # The connection is shared by the job's planning and copy threads
+        if path == INGEST_INDEX_FILE:
+            ensure_log_dir()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "project TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, partial_hash TEXT NOT NULL, "
+                "name TEXT NOT NULL, ingested REAL NOT NULL, "
+                "PRIMARY KEY (project, size, mtime_ns, partial_hash))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS counters (project TEXT PRIMARY KEY, last_index INTEGER NOT NULL)"
+            )
+
+    # Returns the name a file was ingested under if this project already ingested it, otherwise None.
+    def ingested_name(self, project, path, size, mtime_ns):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT partial_hash, name FROM files WHERE project = ? AND size = ? AND mtime_ns = ?",
+                (project, size, mtime_ns),
+            ).fetchall()
+        if not rows:
+            return None
+        partial_hash = fingerprint(path, size, mtime_ns)[2]
+        return next((name for candidate, name in rows if candidate == partial_hash), None)
+
+    # Records ingested files in one transaction. files holds (fingerprint, ingested name) pairs.
+    def record(self, project, files, ingested):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                [(project, size, mtime_ns, partial_hash, name, ingested)
+                 for (size, mtime_ns, partial_hash), name in files],
+            )
+
+    # Returns the next file number for a project, without reserving it.
+    def next_index(self, project):
+        with self._lock:
+            row = self._connection.execute("SELECT last_index FROM counters WHERE project = ?", (project,)).fetchone()
+        return row[0] + 1 if row else 1
+
+    # Takes file numbers first..last for a project. Returns False if another job has taken any of
+    # them since next_index() was read, in which case the caller plans again.
+    def claim(self, project, first, last):
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (project,))
+            cursor = self._connection.execute(
+                "UPDATE counters SET last_index = ? WHERE project = ? AND last_index < ?", (last, project, first)
+            )
+        return cursor.rowcount == 1
+
+    # Moves a project's counter forward to at least last, for numbers a resumed job planned earlier.
+    def advance(self, project, last):
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (project,))
+            self._connection.execute(
+                "UPDATE counters SET last_index = MAX(last_index, ?) WHERE project = ?", (last, project)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
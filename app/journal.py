@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from app.config import JOB_DIR
+
+
+# The JournalEntry class holds the replayed state of one planned file.
+class JournalEntry:
+    def __init__(self, index, source, name, size, clip=None):
+        self.index = index  # Deterministic position of the file in the job
+        self.clip = index if clip is None else clip  # Clip number used in the new name, shared by a clip's files
+        self.source = source  # Original path of the file on the card
+        self.name = name  # Planned file name after renaming
+        self.size = size  # Size of the file in bytes
+        self.renamed = False  # True once the source has been renamed in place
+        self.offset = 0  # Bytes confirmed written to the destination
+        self.digest = None  # Verified checksum, set once the copy is confirmed
+        self.committing = False  # True once the copy is being renamed into place, so its export files may exist
+        self.failed = {}  # Destinations that failed for this file, mapped to the error message
+
+
+# The IngestJournal class is a crash-safe, append-only JSONL log of one ingest job.
+# Each line is a single event; replaying the file rebuilds which files were planned, renamed,
+# partially copied and verified, so an interrupted job can pick up where it stopped.
+class IngestJournal:
+    def __init__(self, path):
+        self.path = path
+        self.params = None  # Job parameters recorded when the job was planned
+        self.import_date = None  # Import date used in file names, fixed for the life of the job
+        self.entries = {}  # Planned files keyed by index
+        self.planned = False  # True once the scan has finished and every file has been planned
+        self.completed = False
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            self._replay()
+
+    # Returns the journal for a job, identified by a hash of the parameters that define it.
+    @classmethod
+    def for_job(cls, params):
+        encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+        job_id = hashlib.sha1(encoded).hexdigest()[:16]
+        os.makedirs(JOB_DIR, exist_ok=True)
+        return cls(os.path.join(JOB_DIR, f"{job_id}.jsonl"))
+
+    # Identifier of the job, the journal's file name without extension.
+    @property
+    def job_id(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    # True if the journal describes a job that was started but never completed.
+    @property
+    def resumable(self):
+        return bool(self.entries) and not self.completed
+
+    # Rebuilds the job state from the journal file.
+    # A torn final line (from a crash mid-write) is ignored; everything before it is still valid.
+    def _replay(self):
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring incomplete journal record in {self.path}")
+                    break
+                self._apply(record)
+
+    def _apply(self, record):
+        event = record["event"]
+        if event == "job":
+            self.params = record["params"]
+            self.import_date = record["import_date"]
+        elif event == "planned":
+            self.entries[record["index"]] = JournalEntry(
+                record["index"], record["source"], record["name"], record["size"], record.get("clip")
+            )
+        elif event == "plan_complete":
+            self.planned = True
+        elif event == "renamed":
+            self.entries[record["index"]].renamed = True
+        elif event == "committing":
+            self.entries[record["index"]].committing = True
+        elif event == "rolled_back":
+            entry = self.entries[record["index"]]
+            entry.renamed = False
+            entry.offset = 0
+        elif event == "progress":
+            self.entries[record["index"]].offset = record["offset"]
+        elif event == "verified":
+            entry = self.entries[record["index"]]
+            entry.offset = entry.size
+            entry.digest = record["digest"]
+            entry.failed = record.get("failed", {})
+        elif event == "completed":
+            self.completed = True
+
+    # Appends a record and applies it to the in-memory state.
+    # With sync=True the record is fsynced before returning, so it survives a crash or power loss.
+    def append(self, event, sync=True, **fields):
+        record = {"event": event, "time": time.time(), **fields}
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self._apply(record)
+
+    # Starts a new job in this journal, discarding any finished job that used the same path.
+    def start(self, params, import_date):
+        if os.path.exists(self.path):
+            self.archive()
+            self.entries = {}
+            self.planned = False
+            self.completed = False
+        self.append("job", sync=False, params=params, import_date=import_date)
+
+    # Marks the job completed and moves the journal aside so the next run with these parameters starts fresh.
+    def finish(self):
+        self.append("completed")
+        self.archive()
+
+    # Renames the journal file to a timestamped name, keeping it for reference.
+    def archive(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                base, ext = os.path.splitext(self.path)
+                os.replace(self.path, f"{base}-{int(time.time())}{ext}")
+
+    # Flushes records appended with sync=False to disk.
+    def sync(self):
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
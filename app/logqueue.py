@@ -0,0 +1,50 @@
+import atexit
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from app.config import LOG_FILE, LOG_LEVEL, LOG_FORMAT, ensure_log_dir
+
+# The LogFileHandler class opens the log file, creating the log directory, when the first record is written
+# on the listener thread instead of when logging starts.
+class LogFileHandler(logging.FileHandler):
+    def __init__(self, path):
+        super().__init__(path, delay=True)
+
+    def _open(self):
+        ensure_log_dir()
+        return super()._open()
+
+
+# Records waiting for the listener thread.
+_queue = queue.SimpleQueue()
+_listener = None
+
+
+# Routes all logging through a queue. Loggers on any thread (copy workers included) only put the
+# record on the queue; a single QueueListener thread formats it and writes it to the log file and to
+# the given handlers, so a slow disk or a busy console never holds up a copy.
+# Safe to call more than once: later calls add their handlers to the running listener.
+def start_logging(*handlers):
+    global _listener
+    if _listener is None:
+        file_handler = LogFileHandler(LOG_FILE)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        _listener = QueueListener(_queue, file_handler, respect_handler_level=True)
+        root_logger = logging.getLogger()
+        root_logger.setLevel(LOG_LEVEL)
+        root_logger.addHandler(QueueHandler(_queue))
+        _listener.start()
+        atexit.register(stop_logging)
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        # The listener reads its handler tuple for every record, so swapping it in is safe while it runs.
+        _listener.handlers = _listener.handlers + (handler,)
+
+
+# Writes out every queued record and stops the listener thread.
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,61 @@
+import os
+import csv
+import getpass
+import socket
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+from app.config import APP_NAME, VERSION
+
+# Manifest formats that can be written next to the export.
+MANIFEST_FORMATS = ["mhl", "csv"]
+
+# MHL element names for each checksum algorithm. BLAKE3 has no MHL 1.1 element, so it gets its own.
+MHL_HASH_ELEMENTS = {
+    "xxhash64": "xxhash64be",
+    "md5": "md5",
+    "blake3": "blake3",
+}
+
+
+# Formats a timestamp the way MHL expects (UTC, ISO 8601, second precision).
+def _mhl_date(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# Writes a per-batch manifest of copied files and their checksums into export_path.
+# files are (CopyTask, destination path) pairs for the copies in this export directory; returns the manifest path.
+def write_manifest(export_path, name, files, algorithm, manifest_format, start_time, finish_time):
+    files = sorted(files, key=lambda file: file[0].index)
+    if manifest_format == "csv":
+        path = os.path.join(export_path, f"{name}.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["file", "size", "algorithm", "hash", "verified", "source"])
+            for task, destination in files:
+                writer.writerow([
+                    os.path.relpath(destination, export_path), task.size, algorithm,
+                    task.digest, task.verified, task.source,
+                ])
+        return path
+
+    if manifest_format != "mhl":
+        raise ValueError(f"Unknown manifest format: {manifest_format}")
+
+    path = os.path.join(export_path, f"{name}.mhl")
+    hashlist = ElementTree.Element("hashlist", version="1.1")
+    creator = ElementTree.SubElement(hashlist, "creatorinfo")
+    ElementTree.SubElement(creator, "username").text = getpass.getuser()
+    ElementTree.SubElement(creator, "hostname").text = socket.gethostname()
+    ElementTree.SubElement(creator, "tool").text = f"{APP_NAME} v{VERSION}"
+    ElementTree.SubElement(creator, "startdate").text = _mhl_date(start_time)
+    ElementTree.SubElement(creator, "finishdate").text = _mhl_date(finish_time)
+    for task, destination in files:
+        entry = ElementTree.SubElement(hashlist, "hash")
+        ElementTree.SubElement(entry, "file").text = os.path.relpath(destination, export_path)
+        ElementTree.SubElement(entry, "size").text = str(task.size)
+        ElementTree.SubElement(entry, "lastmodificationdate").text = _mhl_date(os.path.getmtime(destination))
+        ElementTree.SubElement(entry, MHL_HASH_ELEMENTS[algorithm]).text = task.digest
+        ElementTree.SubElement(entry, "hashdate").text = _mhl_date(finish_time)
+    ElementTree.indent(hashlist)
+    ElementTree.ElementTree(hashlist).write(path, encoding="UTF-8", xml_declaration=True)
+    return path
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from app.config import METRICS_FORMAT, METRICS_JSONL_FILE, METRICS_PROMETHEUS_FILE, ensure_log_dir
+
+METRICS_FORMATS = ("jsonl", "prometheus")
+
+# Records waiting for the writer thread; None stops it.
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+_jobs = {}  # Summary of every job finished in this process, keyed by job id, for the Prometheus file
+
+
+# Returns the metrics outputs named in a METRICS_FORMAT value ("off", "jsonl", "prometheus" or both, comma-separated).
+def parse_formats(value):
+    formats = {name.strip().lower() for name in value.split(",")} - {"", "off"}
+    unknown = formats - set(METRICS_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown metrics format: {', '.join(sorted(unknown))}")
+    return formats
+
+
+# The JobMetrics class records structured measurements of one ingest: a "phase" record as each phase
+# ends, a "file" record per copied file and a "job" summary at the end. Records are only put on a queue;
+# a background thread appends them to METRICS_JSONL_FILE and/or rewrites METRICS_PROMETHEUS_FILE, so
+# a slow disk never holds up a copy. Nothing is recorded per chunk, and with metrics off every call returns at once.
+class JobMetrics:
+    def __init__(self, job=None, project=None, formats=METRICS_FORMAT):
+        self.formats = parse_formats(formats) if job else set()  # Outputs written; empty when metrics are off
+        self.enabled = bool(self.formats)
+        self.job = job  # Job id, the name of the job's journal
+        self.project = project
+        self.files = 0  # Files recorded so far
+        self.bytes = 0  # Bytes those files copied in this run
+        self.retries = 0  # Source read retries of those files
+        self.failed_destinations = set()  # Export directories any of them failed on
+
+    def phase(self, name, seconds):
+        if self.enabled:
+            self._put("phase", phase=name, seconds=round(seconds, 6))
+
+    # Records a copied and verified CopyTask: bytes, copy/verify/fsync durations, throughput and retries.
+    def file(self, task):
+        if not self.enabled:
+            return
+        copied = task.size - task.resume_offset
+        copy_seconds = task.timings.get("copy", 0.0)
+        self.files += 1
+        self.bytes += copied
+        self.retries += task.retries
+        self.failed_destinations.update(os.path.dirname(path) for path in task.failed)
+        self._put(
+            "file",
+            index=task.index,
+            source=task.source,
+            bytes=copied,
+            size=task.size,
+            copy_seconds=round(copy_seconds, 6),
+            verify_seconds=round(task.timings.get("verify", 0.0), 6),
+            fsync_seconds=round(task.timings.get("fsync", 0.0), 6),
+            bytes_per_second=round(copied / copy_seconds) if copy_seconds else None,
+            retries=task.retries,
+            destinations=task.healthy,
+            failed=task.failed,
+        )
+
+    # Records the outcome of the job ("completed", "failed" or "cancelled") with the totals of the files
+    # recorded and the time spent in each phase.
+    def finish(self, status, seconds, phases):
+        if not self.enabled:
+            return
+        self._put(
+            "job",
+            status=status,
+            files=self.files,
+            bytes=self.bytes,
+            seconds=round(seconds, 6),
+            bytes_per_second=round(self.bytes / seconds) if seconds else None,
+            phases={phase: round(value, 6) for phase, value in phases.items()},
+            retries=self.retries,
+            failed_destinations=len(self.failed_destinations),
+        )
+
+    def _put(self, event, **fields):
+        _start_writer()
+        _queue.put((self.formats, {"event": event, "time": time.time(), "job": self.job, "project": self.project,
+                                   **fields}))
+
+
+# Starts the writer thread on first use.
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_records, name="metrics", daemon=True)
+            _writer.start()
+            atexit.register(stop_metrics)
+
+
+# Writer thread: takes records off the queue in batches and writes each batch in one go.
+def _write_records():
+    while True:
+        batch = [_queue.get()]
+        while True:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = None in batch
+        records = [item for item in batch if item is not None]
+        try:
+            ensure_log_dir()
+            _write_jsonl([record for formats, record in records if "jsonl" in formats])
+            finished = [record for formats, record in records if "prometheus" in formats and record["event"] == "job"]
+            if finished:
+                for record in finished:
+                    _jobs[record["job"]] = record
+                _write_prometheus()
+        except OSError as e:
+            logging.warning(f"Could not write metrics: {e}")
+        if stop:
+            return
+
+
+def _write_jsonl(records):
+    if not records:
+        return
+    with open(METRICS_JSONL_FILE, "a") as file:
+        file.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+# Rewrites the Prometheus text file (node_exporter textfile collector format) with the last run of every
+# job seen by this process. The file is replaced atomically so a scrape never sees half of it.
+def _write_prometheus():
+    metrics = [
+        ("simpleingest_job_files", "Files copied and verified by the job.", lambda job: job["files"]),
+        ("simpleingest_job_bytes", "Bytes copied by the job.", lambda job: job["bytes"]),
+        ("simpleingest_job_seconds", "Wall time of the job.", lambda job: job["seconds"]),
+        ("simpleingest_job_retries", "Source reads retried by the job.", lambda job: job["retries"]),
+        ("simpleingest_job_failed_destinations", "Export destinations dropped by the job.",
+         lambda job: job["failed_destinations"]),
+        ("simpleingest_job_success", "1 if the job completed, 0 if it failed or was cancelled.",
+         lambda job: int(job["status"] == "completed")),
+        ("simpleingest_job_finished_timestamp_seconds", "Time the job finished.", lambda job: job["time"]),
+    ]
+    lines = []
+    for name, description, value in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for job in _jobs.values():
+            lines.append(f"{name}{{{_labels(job)}}} {value(job)}")
+    lines.append("# HELP simpleingest_job_phase_seconds Time the job spent in each phase.")
+    lines.append("# TYPE simpleingest_job_phase_seconds gauge")
+    for job in _jobs.values():
+        for phase, seconds in job["phases"].items():
+            lines.append(f'simpleingest_job_phase_seconds{{{_labels(job)},phase="{phase}"}} {seconds}')
+    temporary = METRICS_PROMETHEUS_FILE + ".tmp"
+    with open(temporary, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temporary, METRICS_PROMETHEUS_FILE)
+
+
+def _labels(job):
+    project = str(job["project"]).replace("\\", "\\\\").replace('"', '\\"')
+    return f'job="{job["job"]}",project="{project}"'
+
+
+# Writes out every queued record and stops the writer thread.
+def stop_metrics():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _queue.put(None)
+            _writer.join()
+            _writer = None
@@ -0,0 +1,147 @@
+import os
+import shutil
+import logging
+from app.config import FREE_SPACE_RESERVE
+from app.copyengine import device_id
+
+# Number of problems spelled out in a PreflightError message; the rest are only counted.
+MAX_LISTED_PROBLEMS = 5
+
+
+# Raised when an ingest plan fails its pre-flight checks. Nothing has been renamed or copied yet.
+class PreflightError(ValueError):
+    def __init__(self, report):
+        self.report = report
+        listed = report.problems[:MAX_LISTED_PROBLEMS]
+        more = len(report.problems) - len(listed)
+        message = "Pre-flight checks failed: " + "; ".join(listed)
+        if more:
+            message += f" (and {more} more)"
+        super().__init__(message)
+
+
+# The PreflightReport class holds the outcome of checking an ingest plan before any file is touched.
+class PreflightReport:
+    def __init__(self):
+        self.files = 0  # Files in the plan
+        self.total_bytes = 0  # Size of every file in the plan
+        self.remaining_bytes = 0  # Bytes still to be copied to each destination (less on a resumed job)
+        self.space = {}  # Export directory -> (bytes to copy into it, bytes free on its device)
+        self.collisions = []  # Paths an ingest would overwrite: existing export files or rename targets on the card
+        self.problems = []  # Human-readable reasons the plan cannot run
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    # Returns a short human-readable summary, one line per fact, for the logs and the preview dialog.
+    def lines(self):
+        lines = [f"{self.files} files, {self.total_bytes / 1_000_000_000:.2f} GB "
+                 f"({self.remaining_bytes / 1_000_000_000:.2f} GB still to copy)"]
+        for export_path, (needed, free) in self.space.items():
+            lines.append(f"{export_path}: needs {needed / 1_000_000_000:.2f} GB, {free / 1_000_000_000:.2f} GB free")
+        lines.extend(f"Problem: {problem}" for problem in self.problems)
+        return lines
+
+    def log(self):
+        for line in self.lines():
+            if line.startswith("Problem: "):
+                logging.error(f"Pre-flight: {line}")
+            else:
+                logging.info(f"Pre-flight: {line}")
+
+
+# Returns the nearest existing directory at or above path (the export directory may not exist yet).
+def _existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+# True if path is directory or lies inside it.
+def _is_within(path, directory):
+    path = os.path.normcase(os.path.abspath(path))
+    directory = os.path.normcase(os.path.abspath(directory))
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+# Returns the names in a directory, normalised for case-insensitive filesystems, caching each listing.
+def _listing(directory, cache):
+    if directory not in cache:
+        try:
+            cache[directory] = {os.path.normcase(name) for name in os.listdir(directory)}
+        except OSError:
+            cache[directory] = set()
+    return cache[directory]
+
+
+# Checks a plan of journal entries before anything is renamed or copied: that the sources can be read
+# and renamed, the export directories can be written and their devices have room for the remaining bytes
+# (plus FREE_SPACE_RESERVE), and that no rename or copy would overwrite an existing file.
+# Only directory listings and statvfs-style queries are made, so it finishes in milliseconds.
+# On a resumed job, the export files the journal shows the earlier run committing are its own and do not
+# count as collisions; any other existing file with a planned name does.
+def check_plan(entries, import_path, export_paths, reserve=FREE_SPACE_RESERVE):
+    report = PreflightReport()
+    report.files = len(entries)
+    report.total_bytes = sum(entry.size for entry in entries)
+    report.remaining_bytes = sum(entry.size - entry.offset for entry in entries if not entry.digest)
+    listings = {}
+
+    # Sources: readable, and their directories writable so the files can be renamed in place.
+    source_dirs = set()
+    for entry in entries:
+        if entry.renamed:
+            continue
+        directory = os.path.dirname(entry.source)
+        source_dirs.add(directory)
+        names = _listing(directory, listings)
+        if os.path.normcase(os.path.basename(entry.source)) not in names:
+            if os.path.normcase(entry.name) not in names:
+                report.problems.append(f"Source file is missing: {entry.source}")
+            # Otherwise an earlier run renamed it just before it stopped.
+            continue
+        if os.path.basename(entry.source) != entry.name and os.path.normcase(entry.name) in names:
+            report.collisions.append(os.path.join(directory, entry.name))
+            report.problems.append(f"Renaming {entry.source} would overwrite {entry.name}")
+        elif not os.access(entry.source, os.R_OK):
+            report.problems.append(f"Cannot read {entry.source}")
+    for directory in sorted(source_dirs):
+        if not os.access(directory, os.W_OK | os.X_OK):
+            report.problems.append(f"Cannot rename files in {directory}")
+
+    # Destinations: outside the card, writable, not already holding the planned names, with enough space.
+    devices = {}  # Device -> [bytes needed, bytes free, export directories on it]
+    for export_path in export_paths:
+        if _is_within(export_path, import_path):
+            report.problems.append(f"Export path {export_path} is inside the import path {import_path}")
+        parent = _existing_parent(export_path)
+        if not os.path.isdir(parent) or not os.access(parent, os.W_OK | os.X_OK):
+            report.problems.append(f"Cannot write to export path {export_path}")
+            continue
+        if os.path.isdir(export_path):
+            existing = _listing(export_path, listings)
+            for entry in entries:
+                if entry.committing or entry.digest:
+                    continue
+                if os.path.normcase(entry.name) in existing:
+                    report.collisions.append(os.path.join(export_path, entry.name))
+                    report.problems.append(f"{os.path.join(export_path, entry.name)} already exists")
+        free = shutil.disk_usage(parent).free
+        report.space[export_path] = (report.remaining_bytes, free)
+        device = devices.setdefault(device_id(parent), [0, free, []])
+        device[0] += report.remaining_bytes
+        device[2].append(export_path)
+
+    # Export directories on the same device share its free space.
+    for needed, free, paths in devices.values():
+        if needed + reserve > free:
+            report.problems.append(
+                f"Not enough space for {', '.join(paths)}: {needed / 1_000_000_000:.2f} GB needed, "
+                f"{free / 1_000_000_000:.2f} GB free"
+            )
+    return report
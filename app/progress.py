@@ -0,0 +1,56 @@
+import time
+import threading
+from app.config import PROGRESS_INTERVAL
+
+
+# The ProgressTracker class accumulates bytes copied across a whole batch and reports
+# progress, throughput and ETA through a callback, at most once per interval.
+# Copy workers call add() after every chunk; the rate limit keeps the Qt event loop from being flooded.
+class ProgressTracker:
+    # Weight given to the newest throughput sample when smoothing the reported rate.
+    SMOOTHING = 0.3
+
+    def __init__(self, total_bytes, callback, interval=PROGRESS_INTERVAL, done_bytes=0):
+        self.total_bytes = total_bytes
+        self.callback = callback  # Called as callback(done_bytes, total_bytes, bytes_per_second, eta_seconds)
+        self.interval = interval
+        self.done_bytes = done_bytes  # Bytes already copied, e.g. by an earlier run of a resumed job
+        self.rate = 0.0
+        self._lock = threading.Lock()
+        self._start_time = self._last_time = time.monotonic()
+        self._start_bytes = self._last_bytes = done_bytes
+
+    # Records nbytes as copied and reports if the interval has elapsed since the last report.
+    # A negative nbytes takes back bytes of a copy that has to start again; it does not count against the rate.
+    def add(self, nbytes):
+        with self._lock:
+            self.done_bytes += nbytes
+            if nbytes < 0:
+                self._last_bytes += nbytes
+                self._start_bytes += nbytes
+                return
+            now = time.monotonic()
+            elapsed = now - self._last_time
+            if elapsed < self.interval:
+                return
+            sample = (self.done_bytes - self._last_bytes) / elapsed
+            self.rate = sample if not self.rate else self.SMOOTHING * sample + (1 - self.SMOOTHING) * self.rate
+            self._last_time = now
+            self._last_bytes = self.done_bytes
+            report = (self.done_bytes, self.total_bytes, self.rate, self.eta())
+        self.callback(*report)
+
+    # Reports the final state regardless of the rate limit, with the average rate if none was sampled.
+    def finish(self):
+        with self._lock:
+            if not self.rate:
+                elapsed = time.monotonic() - self._start_time
+                self.rate = (self.done_bytes - self._start_bytes) / elapsed if elapsed > 0 else 0.0
+            report = (self.done_bytes, self.total_bytes, self.rate, 0)
+        self.callback(*report)
+
+    # Returns the estimated seconds remaining, or -1 while no rate has been measured yet.
+    def eta(self):
+        if self.rate <= 0:
+            return -1
+        return int(max(0, self.total_bytes - self.done_bytes) / self.rate)
@@ -0,0 +1,44 @@
+import os
+import stat
+
+# Directories that never hold camera media: OS metadata, trash and recovery folders.
+# Hidden directories (leading ".") are always skipped as well.
+IGNORED_DIRECTORIES = {
+    "System Volume Information", "$RECYCLE.BIN", "RECYCLER", "RECYCLED", "LOST.DIR", "FOUND.000",
+}
+
+# Windows marks hidden and system entries with attributes rather than a leading dot.
+_HIDDEN_ATTRIBUTES = stat.FILE_ATTRIBUTE_HIDDEN | stat.FILE_ATTRIBUTE_SYSTEM if os.name == "nt" else 0
+
+
+# Returns True for hidden or system entries that should be skipped.
+def _is_hidden(entry):
+    if entry.name.startswith("."):
+        return True
+    if _HIDDEN_ATTRIBUTES:
+        return bool(entry.stat(follow_symlinks=False).st_file_attributes & _HIDDEN_ATTRIBUTES)
+    return False
+
+
+# Walks root recursively and yields (path, size, mtime_ns) for every file whose extension is in extensions.
+# Built on os.scandir so file type, size and modification time come from the directory entry's cached stat data.
+# Entries are visited depth-first in name order, so the same card always yields files in the same order,
+# and results stream out as they are found so copying can start before the scan has finished.
+def scan_media(root, extensions):
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            if _is_hidden(entry):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in IGNORED_DIRECTORIES:
+                    subdirectories.append(entry.path)
+            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                stat_result = entry.stat()
+                yield entry.path, stat_result.st_size, stat_result.st_mtime_ns
+        # Push in reverse so subdirectories are visited in name order.
+        stack.extend(reversed(subdirectories))
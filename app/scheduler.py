@@ -0,0 +1,139 @@
+import os
+import itertools
+import logging
+from app.config import MAX_CONCURRENT_JOBS, JOBS_PER_SOURCE_DEVICE, JOBS_PER_DEST_DEVICE
+from app.control import JobControl
+
+# Job states shown in the queue.
+QUEUED = "Queued"
+RUNNING = "Running"
+PAUSED = "Paused"
+COMPLETED = "Completed"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+
+# States in which a job no longer takes part in scheduling.
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+# The QueuedJob class wraps an IngestJob with its place in the queue.
+class QueuedJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, job):
+        self.id = next(self._ids)
+        self.job = job  # The IngestJob to run, with its own camera/scene metadata
+        self.state = QUEUED
+        self.started = False  # True once the job has been handed to a worker thread
+        self.control = JobControl()  # Pause/cancel control handed to the running ingest
+        from app.copyengine import device_id  # Imported on first use to keep the copy engine out of GUI startup
+
+        self.source_device = device_id(job.import_path)
+        self.dest_devices = {device_id(path) for path in job.export_paths}
+        self.export_dirs = {os.path.normcase(os.path.abspath(path)) for path in job.export_paths}
+
+    # True while the job holds its devices: started and not yet finished (paused jobs included).
+    @property
+    def active(self):
+        return self.started and self.state not in FINISHED_STATES
+
+
+# The JobScheduler class holds the ingest queue and decides which jobs may start.
+# A job only starts when the running jobs reading from its source device and writing to its
+# destination devices are all under their limits, and no running job exports to any of the same
+# directories. Queued jobs are considered in queue order; a job that has to wait does not hold
+# back jobs behind it that use other devices.
+# The scheduler only makes decisions; the caller runs the jobs and reports back through finish().
+class JobScheduler:
+    def __init__(self, max_jobs=MAX_CONCURRENT_JOBS, jobs_per_source=JOBS_PER_SOURCE_DEVICE,
+                 jobs_per_dest=JOBS_PER_DEST_DEVICE):
+        self.max_jobs = max(1, max_jobs)
+        self.jobs_per_source = max(1, jobs_per_source)
+        self.jobs_per_dest = max(1, jobs_per_dest)
+        self.jobs = []  # All jobs in queue order, including finished ones
+
+    def add(self, job):
+        queued = QueuedJob(job)
+        self.jobs.append(queued)
+        logging.info(f"Job {queued.id} queued: {job.import_path} -> {', '.join(job.export_paths)}")
+        return queued
+
+    def get(self, job_id):
+        for queued in self.jobs:
+            if queued.id == job_id:
+                return queued
+        raise KeyError(job_id)
+
+    # True once every job in the queue has finished.
+    def idle(self):
+        return all(queued.state in FINISHED_STATES for queued in self.jobs)
+
+    # Returns the queued jobs that can start now, marking them running.
+    def start_runnable(self):
+        active = [queued for queued in self.jobs if queued.active]
+        started = []
+        for queued in self.jobs:
+            if len(active) >= self.max_jobs:
+                break
+            if queued.state == QUEUED and self._can_start(queued, active):
+                queued.state = RUNNING
+                queued.started = True
+                active.append(queued)
+                started.append(queued)
+                logging.info(f"Job {queued.id} started.")
+        return started
+
+    def _can_start(self, queued, active):
+        if sum(1 for other in active if other.source_device == queued.source_device) >= self.jobs_per_source:
+            return False
+        for device in queued.dest_devices:
+            if sum(1 for other in active if device in other.dest_devices) >= self.jobs_per_dest:
+                return False
+        return all(not other.export_dirs & queued.export_dirs for other in active)
+
+    # Records how a started job ended (COMPLETED, FAILED or CANCELLED).
+    def finish(self, job_id, state):
+        queued = self.get(job_id)
+        queued.state = state
+        logging.info(f"Job {queued.id} {state.lower()}.")
+
+    # Pauses a job. A running job stops at its next checkpoint but keeps its place on its devices.
+    def pause(self, job_id):
+        queued = self.get(job_id)
+        if queued.state == RUNNING:
+            queued.control.pause()
+        elif queued.state != QUEUED:
+            return
+        queued.state = PAUSED
+        logging.info(f"Job {queued.id} paused.")
+
+    def resume(self, job_id):
+        queued = self.get(job_id)
+        if queued.state != PAUSED:
+            return
+        if queued.started:
+            queued.control.resume()
+            queued.state = RUNNING
+        else:
+            queued.state = QUEUED
+        logging.info(f"Job {queued.id} resumed.")
+
+    # Cancels a job. A job that has not started is cancelled at once; a running one is asked to
+    # stop and is marked cancelled when its thread reports back through finish().
+    def cancel(self, job_id):
+        queued = self.get(job_id)
+        if queued.state in FINISHED_STATES:
+            return
+        if queued.started:
+            queued.control.cancel()
+            logging.info(f"Job {queued.id} cancelling.")
+        else:
+            queued.state = CANCELLED
+            logging.info(f"Job {queued.id} cancelled.")
+
+    # Moves a job up (negative offset) or down the queue, changing which waiting job starts first.
+    def move(self, job_id, offset):
+        queued = self.get(job_id)
+        position = self.jobs.index(queued)
+        target = min(max(position + offset, 0), len(self.jobs) - 1)
+        self.jobs.insert(target, self.jobs.pop(position))
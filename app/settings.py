@@ -0,0 +1,40 @@
+import os
+import json
+import logging
+import threading
+from app.config import SETTINGS_FILE
+
+# Serialises read-modify-write cycles of the settings file within this process.
+_lock = threading.Lock()
+
+
+# Returns the saved settings, or an empty dict if none were saved yet or the file cannot be read.
+def read_settings():
+    try:
+        with open(SETTINGS_FILE, "r") as file:
+            settings = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read settings from {SETTINGS_FILE}: {e}")
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+# Merges values into the saved settings, or into one section of them (e.g. "devices"), and writes them back.
+# Other keys are kept, so the GUI fields and the tuned device settings can be saved independently.
+# The file is written under a temporary name and renamed over the old one, so a crash mid-write
+# leaves the previous settings intact instead of a truncated file.
+def update_settings(values, section=None):
+    with _lock:
+        settings = read_settings()
+        if section is None:
+            settings.update(values)
+        else:
+            settings.setdefault(section, {}).update(values)
+        temporary = SETTINGS_FILE + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(settings, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, SETTINGS_FILE)
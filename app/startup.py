@@ -0,0 +1,20 @@
+import time
+import logging
+
+# Named points of the start-up path with the time they were reached. The first is taken when this module
+# is imported, which simpleingest.py does before anything else.
+_marks = [("start", time.perf_counter())]
+
+
+# Records that start-up has reached the named point.
+def mark(name):
+    _marks.append((name, time.perf_counter()))
+
+
+# Logs how long start-up took in total and between each pair of marks, e.g.
+# "Startup took 412 ms (imports 260 ms, logging 4 ms, application 38 ms, window 70 ms, settings 12 ms, first paint 28 ms)".
+def report():
+    steps = ", ".join(
+        f"{name} {(moment - previous) * 1000:.0f} ms" for (_, previous), (name, moment) in zip(_marks, _marks[1:])
+    )
+    logging.info(f"Startup took {(_marks[-1][1] - _marks[0][1]) * 1000:.0f} ms ({steps})")
@@ -1,23 +1,13 @@
+from app import startup  # Imported first so start-up is timed from here
 import sys
 import logging
-from PyQt5.QtWidgets import QApplication
-from app.main import MediaIngestGUI  # Import the main GUI class for the application
-from app.config import (
-    LOG_FILE, LOG_LEVEL  # Import logging configurations
-)
+from app.logqueue import start_logging  # Queue-based logging shared by the GUI and the CLI
 
 # Configure logging
-def configure_logging():
+def configure_logging(stream=sys.stdout):
     # Sets up logging configuration for the application.
-    # Logs messages to both a file and the console.
-    logging.basicConfig(
-        level=LOG_LEVEL,  # Set the logging level (e.g., DEBUG, INFO, ERROR)
-        format="%(asctime)s - %(levelname)s - %(message)s",  # Define log message format
-        handlers=[
-            logging.FileHandler(LOG_FILE),           # Handler to write logs to a file
-            logging.StreamHandler(sys.stdout),       # Handler to output logs to the console
-        ]
-    )
+    # Logs messages to both a file and the console, written from a background thread.
+    start_logging(logging.StreamHandler(stream))
 
 # Exception hook to catch uncaught exceptions
 def exception_hook(exc_type, exc_value, traceback):
@@ -26,9 +16,22 @@ def exception_hook(exc_type, exc_value, traceback):
     logging.critical("Uncaught exception", exc_info=(exc_type, exc_value, traceback))
     sys.__excepthook__(exc_type, exc_value, traceback)
 
-if __name__ == "__main__":
+# Runs the headless command line. stdout carries machine-readable progress, so logs go to stderr.
+def run_cli(argv):
+    from app.cli import main
+    configure_logging(sys.stderr)
+    sys.excepthook = exception_hook
+    return main(argv)
+
+# Runs the PyQt GUI. PyQt5 is only imported here so headless runs never load it.
+def run_gui():
+    from PyQt5.QtWidgets import QApplication
+    from app.main import MediaIngestGUI  # Import the main GUI class for the application
+    startup.mark("imports")
+
     # Configure logging for the application
     configure_logging()
+    startup.mark("logging")
 
     # Set the custom exception hook to catch and log any uncaught exceptions
     sys.excepthook = exception_hook
@@ -38,8 +41,10 @@ if __name__ == "__main__":
 
     # Initialise the PyQt application
     app = QApplication(sys.argv)  # Create the main application object
+    startup.mark("application")
     gui = MediaIngestGUI()  # Create an instance of the Media Ingest GUI
     gui.show()  # Display the GUI window
+    startup.mark("window")  # The GUI logs the start-up report once the window has been painted
 
     try:
         # Run the application event loop
@@ -50,5 +55,11 @@ if __name__ == "__main__":
         logging.critical(f"Unhandled exception during app execution: {e}", exc_info=True)
         exit_code = 1  # Set exit code to indicate an error occurred
 
+    return exit_code
+
+if __name__ == "__main__":
+    # Any command line arguments select the headless mode; none starts the GUI.
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     # Exit the application with the appropriate exit code
-    sys.exit(exit_code)
+    sys.exit(run_gui())
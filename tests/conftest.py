@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Keep the logs, job journals, ingest index and settings the tests write out of the working tree.
+# app.config reads these when it is first imported, so they are set before any test module imports the app.
+_scratch = tempfile.mkdtemp(prefix="simpleingest-tests-")
+os.environ["LOG_DIR"] = os.path.join(_scratch, "log")
+os.environ["SETTINGS_FILE"] = os.path.join(_scratch, "settings.json")
+os.environ.setdefault("HASH_ALGORITHM", "md5")  # xxhash and blake3 are optional packages
+os.environ["AUTOTUNE"] = "off"
+os.environ["METRICS_FORMAT"] = "off"
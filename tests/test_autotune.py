@@ -0,0 +1,31 @@
+from app.autotune import PairTuning
+from app.copyengine import CopyEngine
+
+
+def test_parallelism_is_tuned_within_the_device_limits():
+    engine = CopyEngine(workers=4, source_limit=2, dest_limit=3, autotune=True)
+    assert engine.tuner.max_concurrency == 2
+    assert CopyEngine(workers=4, source_limit=8, dest_limit=8, autotune=True).tuner.max_concurrency == 4
+
+
+# Throughput here depends only on the chunk size, so the tuner keeps full parallelism with the largest chunks.
+def test_chunk_sizes_then_lower_parallelism_are_tried(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("app.autotune.time.monotonic", lambda: clock[0])
+    pair = PairTuning("card -> raid", 1024, 2, 2, chunk_sizes=[1024, 4096], seconds=100, sample_seconds=1)
+    tried = []
+    while not pair.tuned:
+        tried.append((pair.chunk_size, pair.concurrency))
+        pair.add(0)
+        clock[0] += 1.0
+        pair.add(pair.chunk_size * 1000)
+    assert tried == [(1024, 2), (4096, 2), (4096, 1)]
+    assert (pair.chunk_size, pair.concurrency, pair.limiter.limit) == (4096, 2, 2)
+    assert pair.measured
+
+
+def test_saved_settings_start_tuned_within_the_limit():
+    saved = {"chunk_size": 4096, "concurrency": 8, "bytes_per_second": 100}
+    pair = PairTuning("card -> raid", 1024, 2, 2, saved)
+    assert pair.tuned and not pair.measured
+    assert (pair.chunk_size, pair.concurrency, pair.limiter.limit) == (4096, 2, 2)
@@ -0,0 +1,63 @@
+import os
+import hashlib
+from functools import partial
+import pytest
+import app.ingest
+from app.control import IngestCancelled, JobControl
+from app.copyengine import CopyEngine
+from app.ingest import IngestJob, IngestReporter
+from app.journal import IngestJournal
+
+
+# Cancels the job as soon as its first file has been copied.
+class CancellingReporter(IngestReporter):
+    def __init__(self, control):
+        self.control = control
+        self.completed = []
+
+    def file_completed(self, task):
+        self.completed.append(task.source)
+        self.control.cancel()
+
+
+def md5(path):
+    with open(path, "rb") as file:
+        return hashlib.md5(file.read()).hexdigest()
+
+
+# One file at a time, each committed as soon as it is copied, so the cancellation lands after exactly one file.
+def test_a_cancelled_job_rolls_back_and_can_be_run_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(app.ingest, "CopyEngine", partial(CopyEngine, workers=1, fsync_policy="file"))
+    card = tmp_path / "card"
+    export = tmp_path / "export"
+    card.mkdir()
+    digests = {}
+    for number in range(1, 5):
+        path = card / f"C{number:04d}.MP4"
+        path.write_bytes(os.urandom(300_000))
+        digests[path.name] = md5(path)
+    job = IngestJob(str(card), str(export), tmp_path.name, "Video", "01/02/2026", "01", "0001", hash_algorithm="md5")
+    control = JobControl(drain_seconds=0)
+    reporter = CancellingReporter(control)
+    with pytest.raises(IngestCancelled):
+        job.run(reporter, control)
+
+    # The copied file keeps its new name; the others are back under their original names with no copies left.
+    assert len(reporter.completed) == 1
+    kept = os.path.basename(reporter.completed[0])
+    restored = [name for name, digest in digests.items() if digest != md5(card / kept)]
+    assert len(restored) == 3
+    assert sorted(os.listdir(card)) == sorted(restored + [kept])
+    assert sorted(os.listdir(export)) == [kept]
+    journal = IngestJournal.for_job(job.job_params())
+    assert journal.resumable
+    assert sum(1 for entry in journal.entries.values() if entry.digest) == 1
+    assert not any(entry.renamed for entry in journal.entries.values() if not entry.digest)
+    journal.close()
+
+    assert job.run()
+    copied = sorted(name for name in os.listdir(export) if name.endswith(".MP4"))
+    assert len(copied) == 4
+    assert sorted(md5(export / name) for name in copied) == sorted(digests.values())
+    assert sorted(os.listdir(card)) == copied
+    assert not IngestJournal.for_job(job.job_params()).resumable
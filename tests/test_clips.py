@@ -0,0 +1,87 @@
+import os
+from app.clips import group_clips
+
+CARD = os.path.join(os.sep, "card")
+
+
+# Runs group_clips over (relative path, size) pairs and returns, per clip, the relative paths and the
+# suffix each file's new name gets, in the order the clips and their members come back.
+def grouped(files, span_bytes=1000):
+    clips = group_clips(((os.path.join(CARD, path), size, 0) for path, size in files), span_bytes)
+    return [[(os.path.relpath(member.path, CARD), member.suffix) for member in clip.members] for clip in clips]
+
+
+def test_sony_metadata_joins_its_clip():
+    assert grouped([
+        ("M4ROOT/CLIP/C0001.MP4", 10),
+        ("M4ROOT/CLIP/C0001M01.XML", 1),
+        ("M4ROOT/CLIP/C0002.MP4", 10),
+    ]) == [
+        [("M4ROOT/CLIP/C0001.MP4", ""), ("M4ROOT/CLIP/C0001M01.XML", "M01")],
+        [("M4ROOT/CLIP/C0002.MP4", "")],
+    ]
+
+
+def test_gopro_chapters_and_proxies_form_one_clip():
+    assert grouped([
+        ("DCIM/100GOPRO/GX010123.MP4", 10),
+        ("DCIM/100GOPRO/GX020123.MP4", 10),
+        ("DCIM/100GOPRO/GL010123.LRV", 1),
+        ("DCIM/100GOPRO/GL020123.LRV", 1),
+        ("DCIM/100GOPRO/GX010123.THM", 1),
+        ("DCIM/100GOPRO/GX010124.MP4", 10),
+    ]) == [
+        [
+            ("DCIM/100GOPRO/GL010123.LRV", ""),
+            ("DCIM/100GOPRO/GX010123.MP4", ""),
+            ("DCIM/100GOPRO/GX010123.THM", ""),
+            ("DCIM/100GOPRO/GL020123.LRV", "_02"),
+            ("DCIM/100GOPRO/GX020123.MP4", "_02"),
+        ],
+        [("DCIM/100GOPRO/GX010124.MP4", "")],
+    ]
+
+
+def test_older_gopro_chapters_keep_their_order():
+    assert grouped([
+        ("DCIM/100GOPRO/GP020123.MP4", 10),
+        ("DCIM/100GOPRO/GOPR0123.MP4", 10),
+        ("DCIM/100GOPRO/GP010123.MP4", 10),
+        ("DCIM/100GOPRO/GOPR0123.LRV", 1),
+    ]) == [
+        [
+            ("DCIM/100GOPRO/GOPR0123.LRV", ""),
+            ("DCIM/100GOPRO/GOPR0123.MP4", ""),
+            ("DCIM/100GOPRO/GP010123.MP4", "_02"),
+            ("DCIM/100GOPRO/GP020123.MP4", "_03"),
+        ],
+    ]
+
+
+def test_avchd_segments_at_the_size_limit_are_joined():
+    assert grouped([
+        ("PRIVATE/AVCHD/BDMV/STREAM/00000.MTS", 1000),
+        ("PRIVATE/AVCHD/BDMV/STREAM/00001.MTS", 400),
+        ("PRIVATE/AVCHD/BDMV/STREAM/00002.MTS", 400),
+        ("PRIVATE/AVCHD/BDMV/CLIPINF/00000.CPI", 1),
+        ("PRIVATE/AVCHD/BDMV/CLIPINF/00001.CPI", 1),
+        ("PRIVATE/AVCHD/BDMV/CLIPINF/00002.CPI", 1),
+    ]) == [
+        [
+            ("PRIVATE/AVCHD/BDMV/CLIPINF/00000.CPI", ""),
+            ("PRIVATE/AVCHD/BDMV/STREAM/00000.MTS", ""),
+            ("PRIVATE/AVCHD/BDMV/CLIPINF/00001.CPI", "_02"),
+            ("PRIVATE/AVCHD/BDMV/STREAM/00001.MTS", "_02"),
+        ],
+        [
+            ("PRIVATE/AVCHD/BDMV/CLIPINF/00002.CPI", ""),
+            ("PRIVATE/AVCHD/BDMV/STREAM/00002.MTS", ""),
+        ],
+    ]
+
+
+def test_sidecars_without_media_are_dropped():
+    assert grouped([
+        ("DCIM/100GOPRO/GL010125.LRV", 1),
+        ("DCIM/100GOPRO/GX010126.MP4", 10),
+    ]) == [[("DCIM/100GOPRO/GX010126.MP4", "")]]
@@ -0,0 +1,71 @@
+import os
+import hashlib
+import pytest
+import app.copyengine
+from app.copyengine import CopyEngine, CopyTask
+
+
+# Copies count random files from a card to every export directory and returns (tasks, export directories).
+def copy_card(tmp_path, count=3, exports=("a", "b"), verify_mode="reread", workers=2):
+    card = tmp_path / "card"
+    card.mkdir()
+    directories = [tmp_path / name for name in exports]
+    for directory in directories:
+        directory.mkdir()
+    tasks = []
+    for index in range(1, count + 1):
+        source = card / f"clip{index}.mp4"
+        source.write_bytes(os.urandom(200_000))
+        tasks.append(CopyTask(index, str(source), [str(directory / source.name) for directory in directories], 200_000))
+    engine = CopyEngine(workers=workers, algorithm="md5", verify_mode=verify_mode, autotune=False)
+    engine.copy_all(tasks)
+    return engine, tasks, directories
+
+
+def test_every_destination_gets_a_verified_copy(tmp_path):
+    _, tasks, directories = copy_card(tmp_path)
+    for task in tasks:
+        with open(task.source, "rb") as file:
+            digest = hashlib.md5(file.read()).hexdigest()
+        assert task.verified and task.digest == digest
+        for path in task.destinations:
+            with open(path, "rb") as file:
+                assert hashlib.md5(file.read()).hexdigest() == digest
+    for directory in directories:
+        assert sorted(os.listdir(directory)) == ["clip1.mp4", "clip2.mp4", "clip3.mp4"]
+
+
+def test_a_failed_destination_is_dropped_with_its_staged_copy(tmp_path, monkeypatch):
+    hash_file = app.copyengine.hash_file
+
+    def corrupt_b(path, *args):
+        return "bad" if os.sep + "b" + os.sep in path else hash_file(path, *args)
+
+    monkeypatch.setattr(app.copyengine, "hash_file", corrupt_b)
+    engine, tasks, (good, bad) = copy_card(tmp_path)
+    assert list(engine.failed_destinations) == [str(bad)]
+    assert all(task.healthy == [task.destinations[0]] for task in tasks)
+    assert sorted(os.listdir(good)) == ["clip1.mp4", "clip2.mp4", "clip3.mp4"]
+    assert os.listdir(bad) == []
+
+
+def test_a_failed_sidecar_is_dropped_with_its_staged_files(tmp_path, monkeypatch):
+    write_sidecar = app.copyengine.write_sidecar
+
+    def fail_in_b(path, algorithm, digest, target=None):
+        written = write_sidecar(path, algorithm, digest, target)
+        if os.sep + "b" + os.sep in path:
+            raise OSError("No space left on device")
+        return written
+
+    monkeypatch.setattr(app.copyengine, "write_sidecar", fail_in_b)
+    _, _, (good, bad) = copy_card(tmp_path, count=1, verify_mode="sidecar")
+    assert sorted(os.listdir(good)) == ["clip1.mp4", "clip1.mp4.md5"]
+    assert os.listdir(bad) == []
+
+
+def test_the_last_destination_failing_fails_the_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(app.copyengine, "hash_file", lambda *args: "bad")
+    with pytest.raises(ValueError):
+        copy_card(tmp_path, count=1, exports=("a",))
+    assert os.listdir(tmp_path / "a") == []
@@ -0,0 +1,105 @@
+import os
+import stat
+import hashlib
+import pytest
+from app.copyengine import CopyEngine, CopyTask
+from app.durable import StagedCommitter, fsync_file, staging_path
+
+
+# Writes a staged copy for each destination of a new task and returns the task.
+def staged_task(tmp_path, index, data=b"data"):
+    destination = str(tmp_path / f"file{index}.bin")
+    with open(staging_path(destination), "wb") as file:
+        file.write(data)
+    return CopyTask(index, str(tmp_path / f"source{index}.bin"), [destination], len(data))
+
+
+# Builds a committer recording the tasks it commits and the batches it announces.
+def recording_committer(policy, **kwargs):
+    events = []
+    committer = StagedCommitter(lambda task: events.append(task.index), lambda task, path, error: None, policy,
+                                on_batch=lambda: events.append("batch"), **kwargs)
+    return committer, events
+
+
+def test_file_policy_commits_each_file_on_add(tmp_path):
+    committer, events = recording_committer("file")
+    task = staged_task(tmp_path, 1)
+    committer.add(task)
+    assert events == [1, "batch"]
+    assert os.path.exists(task.destinations[0])
+    assert not os.path.exists(staging_path(task.destinations[0]))
+
+
+def test_batch_policy_commits_when_the_batch_is_full(tmp_path):
+    committer, events = recording_committer("batch", batch_files=2)
+    tasks = [staged_task(tmp_path, index) for index in (1, 2, 3)]
+    committer.add(tasks[0])
+    assert events == []
+    assert not os.path.exists(tasks[0].destinations[0])
+    committer.add(tasks[1])
+    assert events == [1, 2, "batch"]
+    committer.add(tasks[2])
+    committer.flush()
+    assert events == [1, 2, "batch", 3, "batch"]
+
+
+def test_batch_policy_commits_when_the_byte_limit_is_reached(tmp_path):
+    committer, events = recording_committer("batch", batch_files=100, batch_bytes=8)
+    committer.add(staged_task(tmp_path, 1, b"12345"))
+    assert events == []
+    committer.add(staged_task(tmp_path, 2, b"12345"))
+    assert events == [1, 2, "batch"]
+
+
+def test_job_policy_commits_only_on_flush(tmp_path):
+    committer, events = recording_committer("job", batch_files=1)
+    tasks = [staged_task(tmp_path, index) for index in (1, 2)]
+    for task in tasks:
+        committer.add(task)
+    assert events == []
+    committer.flush()
+    assert events == [1, 2, "batch"]
+    assert all(os.path.exists(task.destinations[0]) for task in tasks)
+    assert all(task.timings["fsync"] > 0 for task in tasks)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        StagedCommitter(lambda task: None, lambda task, path, error: None, "never")
+
+
+def test_read_only_files_can_be_flushed(tmp_path):
+    path = tmp_path / "read-only.bin"
+    path.write_bytes(b"data")
+    path.chmod(0o444)
+    fsync_file(str(path))
+
+
+# Cards are often read-only; the copies keep the source's mode without getting in the way of committing them.
+@pytest.mark.parametrize("policy", ["file", "batch", "job"])
+def test_read_only_sources_are_committed_with_their_mode(tmp_path, policy):
+    card = tmp_path / "card"
+    export = tmp_path / "export"
+    card.mkdir()
+    export.mkdir()
+    tasks = []
+    for index in range(1, 4):
+        source = card / f"clip{index}.mp4"
+        source.write_bytes(os.urandom(100_000))
+        source.chmod(0o444)
+        tasks.append(CopyTask(index, str(source), [str(export / source.name)], 100_000))
+    done = []
+    engine = CopyEngine(workers=2, algorithm="md5", verify_mode="sidecar", fsync_policy=policy, autotune=False)
+    engine.copy_all(tasks, on_file_done=done.append)
+
+    assert sorted(task.index for task in done) == [1, 2, 3]
+    for task in tasks:
+        destination = task.destinations[0]
+        with open(task.source, "rb") as file:
+            digest = hashlib.md5(file.read()).hexdigest()
+        assert task.digest == digest
+        assert stat.S_IMODE(os.stat(destination).st_mode) == 0o444
+        with open(f"{destination}.md5") as file:
+            assert file.read().split()[0] == digest
+    assert not [name for name in os.listdir(export) if name.endswith(".part")]
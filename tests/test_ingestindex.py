@@ -0,0 +1,67 @@
+import os
+from app.ingest import IngestJob
+from app.ingestindex import IngestIndex, fingerprint
+
+
+def test_claimed_numbers_are_not_handed_out_again(tmp_path):
+    index = IngestIndex(str(tmp_path / "index.sqlite3"))
+    assert index.next_index("P") == 1
+    assert index.claim("P", 1, 3)
+    assert index.next_index("P") == 4
+    assert not index.claim("P", 3, 5)  # Another job took 3 after this one read next_index()
+    assert index.claim("P", 4, 5)
+    assert index.next_index("Other") == 1
+    index.close()
+
+
+def test_advance_only_moves_the_counter_forward(tmp_path):
+    index = IngestIndex(str(tmp_path / "index.sqlite3"))
+    index.advance("P", 7)
+    index.advance("P", 2)
+    assert index.next_index("P") == 8
+    index.close()
+
+
+# A renamed file keeps its fingerprint, so the index still knows it under its new name.
+def test_ingested_files_are_found_after_a_rename(tmp_path):
+    index = IngestIndex(str(tmp_path / "index.sqlite3"))
+    clip = tmp_path / "C0001.MP4"
+    clip.write_bytes(os.urandom(300_000))
+    index.record("P", [(fingerprint(str(clip)), "P-0001.MP4")], 0)
+    renamed = tmp_path / "P-0001.MP4"
+    clip.rename(renamed)
+    stat_result = renamed.stat()
+    assert index.ingested_name("P", str(renamed), stat_result.st_size, stat_result.st_mtime_ns) == "P-0001.MP4"
+    assert index.ingested_name("Other", str(renamed), stat_result.st_size, stat_result.st_mtime_ns) is None
+    with open(renamed, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        file.write(b"\0")
+    os.utime(renamed, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    assert index.ingested_name("P", str(renamed), stat_result.st_size, stat_result.st_mtime_ns) is None
+    index.close()
+
+
+def ingest(card, export, project):
+    job = IngestJob(str(card), str(export), project, "Video", "01/02/2026", "01", "0001", hash_algorithm="md5")
+    return job.run()
+
+
+# A card inserted again copies only its new clips, numbered on from the project's last clip.
+def test_a_card_inserted_again_only_copies_new_clips(tmp_path):
+    card = tmp_path / "card"
+    export = tmp_path / "export"
+    card.mkdir()
+    for number in (1, 2):
+        (card / f"C{number:04d}.MP4").write_bytes(os.urandom(100_000))
+    project = tmp_path.name
+    assert ingest(card, export, project)
+    copied = sorted(name for name in os.listdir(export) if name.endswith(".MP4"))
+    assert [name[-8:] for name in copied] == ["0001.MP4", "0002.MP4"]
+
+    assert ingest(card, export, project) == []
+    assert sorted(name for name in os.listdir(export) if name.endswith(".MP4")) == copied
+
+    (card / "C0003.MP4").write_bytes(os.urandom(100_000))
+    assert ingest(card, export, project)
+    copied = sorted(name for name in os.listdir(export) if name.endswith(".MP4"))
+    assert [name[-8:] for name in copied] == ["0001.MP4", "0002.MP4", "0003.MP4"]
@@ -0,0 +1,115 @@
+import os
+import stat
+import hashlib
+import pytest
+from app.copyengine import CopyEngine, CopyTask
+from app.durable import StagedCommitter, staging_path
+from app.journal import IngestJournal
+
+CHUNK = 64 * 1024
+
+
+def test_replay_rebuilds_the_job_state(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    journal = IngestJournal(path)
+    journal.start({"project": "P"}, "20260101")
+    journal.append("planned", sync=False, index=1, source="/card/A.MP4", name="P-0001.MP4", size=100, clip=1)
+    journal.append("planned", sync=False, index=2, source="/card/B.MP4", name="P-0002.MP4", size=200, clip=2)
+    journal.append("plan_complete")
+    journal.append("renamed", sync=False, index=1)
+    journal.append("renamed", sync=False, index=2)
+    journal.append("progress", index=2, offset=64)
+    journal.append("committing", sync=False, index=1)
+    journal.append("verified", index=1, digest="abc", failed={"/out2/P-0001.MP4": "disk full"})
+    journal.close()
+
+    replayed = IngestJournal(path)
+    assert replayed.params == {"project": "P"}
+    assert replayed.import_date == "20260101"
+    assert replayed.planned and replayed.resumable
+    first, second = replayed.entries[1], replayed.entries[2]
+    assert (first.renamed, first.committing, first.offset, first.digest, first.failed) == \
+        (True, True, 100, "abc", {"/out2/P-0001.MP4": "disk full"})
+    assert (second.renamed, second.committing, second.offset, second.digest, second.clip) == (True, False, 64, None, 2)
+
+
+def test_a_torn_last_record_is_ignored(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    journal = IngestJournal(path)
+    journal.start({"project": "P"}, "20260101")
+    journal.append("planned", index=1, source="/card/A.MP4", name="P-0001.MP4", size=100)
+    journal.close()
+    with open(path, "a") as file:
+        file.write('{"event": "renamed", "ind')
+
+    replayed = IngestJournal(path)
+    assert list(replayed.entries) == [1]
+    assert not replayed.entries[1].renamed
+
+
+def test_a_finished_job_is_archived(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    journal = IngestJournal(path)
+    journal.start({"project": "P"}, "20260101")
+    journal.append("planned", index=1, source="/card/A.MP4", name="P-0001.MP4", size=100)
+    journal.finish()
+
+    assert not os.path.exists(path)
+    assert not IngestJournal(path).resumable
+    assert len(os.listdir(tmp_path)) == 1
+
+
+# Copies one read-only source until crash(task, offset) raises, and returns (task, source digest).
+def crash_copy(tmp_path, crash=None, fsync_policy="batch"):
+    source = tmp_path / "clip.mp4"
+    source.write_bytes(os.urandom(5 * CHUNK + 123))
+    source.chmod(0o444)
+    export = tmp_path / "export"
+    export.mkdir()
+    task = CopyTask(1, str(source), [str(export / "clip.mp4")], source.stat().st_size)
+    engine = CopyEngine(workers=1, chunk_size=CHUNK, checkpoint_bytes=2 * CHUNK, algorithm="md5",
+                        fsync_policy=fsync_policy, autotune=False)
+    with pytest.raises(RuntimeError):
+        engine.copy_all([task], on_checkpoint=crash)
+    return task, hashlib.md5(source.read_bytes()).hexdigest()
+
+
+# Copies a task again from resume_offset, as a resumed job does, and checks the result.
+def resume_copy(task, resume_offset, digest):
+    resumed = CopyTask(task.index, task.source, task.destinations, task.size, resume_offset)
+    done = []
+    CopyEngine(workers=1, chunk_size=CHUNK, algorithm="md5", autotune=False).copy_all([resumed], on_file_done=done.append)
+    assert done == [resumed]
+    assert resumed.digest == digest
+    destination = task.destinations[0]
+    with open(destination, "rb") as file:
+        assert hashlib.md5(file.read()).hexdigest() == digest
+    assert stat.S_IMODE(os.stat(destination).st_mode) == 0o444
+    assert not os.path.exists(staging_path(destination))
+
+
+def test_a_copy_resumes_from_its_last_checkpoint(tmp_path):
+    checkpoints = []
+
+    def crash(task, offset):
+        checkpoints.append(offset)
+        raise RuntimeError("crash")
+
+    task, digest = crash_copy(tmp_path, crash)
+    assert checkpoints == [2 * CHUNK]
+    assert os.path.getsize(staging_path(task.destinations[0])) >= 2 * CHUNK
+    resume_copy(task, checkpoints[0], digest)
+
+
+# A crash after a file was copied but before its batch was committed leaves the staged copy behind;
+# it must still be writable so the resumed job can copy the file again.
+def test_a_copy_staged_but_not_committed_can_be_copied_again(tmp_path, monkeypatch):
+    def crash(self):
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(StagedCommitter, "flush", crash)
+    task, digest = crash_copy(tmp_path, fsync_policy="job")
+    staged = staging_path(task.destinations[0])
+    assert os.stat(staged).st_mode & stat.S_IWUSR
+    monkeypatch.undo()
+    resume_copy(task, 0, digest)
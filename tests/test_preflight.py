@@ -0,0 +1,75 @@
+import os
+from app.journal import JournalEntry
+from app.preflight import check_plan
+
+
+# Writes the sources of a plan to a card directory and returns (card, export directory, entries).
+def make_plan(tmp_path, count=2, size=1000):
+    card = tmp_path / "card"
+    export = tmp_path / "export"
+    card.mkdir()
+    export.mkdir()
+    entries = []
+    for index in range(1, count + 1):
+        source = card / f"C{index:04d}.MP4"
+        source.write_bytes(b"x" * size)
+        entries.append(JournalEntry(index, str(source), f"P-{index:04d}.MP4", size, index))
+    return str(card), str(export), entries
+
+
+def test_a_clean_plan_passes(tmp_path):
+    card, export, entries = make_plan(tmp_path)
+    report = check_plan(entries, card, [export], reserve=0)
+    assert report.ok, report.problems
+    assert (report.files, report.total_bytes, report.remaining_bytes) == (2, 2000, 2000)
+    assert report.space[export][0] == 2000
+
+
+def test_existing_export_files_are_collisions(tmp_path):
+    card, export, entries = make_plan(tmp_path)
+    open(os.path.join(export, "P-0002.MP4"), "w").close()
+    report = check_plan(entries, card, [export], reserve=0)
+    assert not report.ok
+    assert report.collisions == [os.path.join(export, "P-0002.MP4")]
+
+
+def test_rename_targets_on_the_card_are_collisions(tmp_path):
+    card, export, entries = make_plan(tmp_path)
+    open(os.path.join(card, "P-0001.MP4"), "w").close()
+    report = check_plan(entries, card, [export], reserve=0)
+    assert report.collisions == [os.path.join(card, "P-0001.MP4")]
+
+
+def test_missing_sources_are_reported(tmp_path):
+    card, export, entries = make_plan(tmp_path)
+    os.remove(entries[0].source)
+    report = check_plan(entries, card, [export], reserve=0)
+    assert report.problems == [f"Source file is missing: {entries[0].source}"]
+
+
+def test_the_free_space_reserve_is_kept(tmp_path):
+    card, export, entries = make_plan(tmp_path)
+    report = check_plan(entries, card, [export], reserve=10 ** 18)
+    assert not report.ok
+    assert report.problems[0].startswith(f"Not enough space for {export}")
+
+
+def test_an_export_path_inside_the_card_is_refused(tmp_path):
+    card, _, entries = make_plan(tmp_path)
+    report = check_plan(entries, card, [os.path.join(card, "export")], reserve=0)
+    assert not report.ok
+
+
+# On a resumed job the files the earlier run committed are its own; any other existing file still collides.
+def test_a_resumed_job_only_skips_the_files_it_committed(tmp_path):
+    card, export, entries = make_plan(tmp_path, count=3)
+    for entry in entries:
+        entry.renamed = True
+        os.rename(entry.source, os.path.join(card, entry.name))
+        open(os.path.join(export, entry.name), "w").close()
+    entries[0].digest = "abc"
+    entries[0].offset = entries[0].size
+    entries[1].committing = True
+    report = check_plan(entries, card, [export], reserve=0)
+    assert report.collisions == [os.path.join(export, "P-0003.MP4")]
+    assert report.remaining_bytes == 2000
@@ -0,0 +1,80 @@
+import os
+from app.ingest import IngestJob, IngestReporter
+from app.progress import ProgressTracker
+
+
+# Writes count files of size bytes to a card directory and returns its path.
+def make_card(tmp_path, count, size):
+    card = tmp_path / "card"
+    card.mkdir()
+    for number in range(1, count + 1):
+        (card / f"C{number:04d}.MP4").write_bytes(os.urandom(size))
+    return card
+
+
+def test_progress_covers_the_whole_plan_from_the_start(tmp_path, monkeypatch):
+    card = make_card(tmp_path, 24, 50_000)
+    totals = []
+    add = ProgressTracker.add
+
+    def recording_add(self, nbytes):
+        totals.append(self.total_bytes)
+        add(self, nbytes)
+
+    monkeypatch.setattr(ProgressTracker, "add", recording_add)
+    reports = []
+
+    class Reporter(IngestReporter):
+        def progress(self, done_bytes, total_bytes, rate, eta):
+            reports.append((done_bytes, total_bytes))
+
+    job = IngestJob(str(card), str(tmp_path / "export"), tmp_path.name, "Video", "01/02/2026", "01", "0001",
+                    hash_algorithm="md5")
+    job.run(Reporter())
+    assert totals and set(totals) == {24 * 50_000}
+    assert reports[-1] == (24 * 50_000, 24 * 50_000)
+
+
+# Builds a tracker on a fake clock and returns (tracker, reports, clock).
+def fake_tracker(monkeypatch, total_bytes, done_bytes=0):
+    clock = [100.0]
+    monkeypatch.setattr("app.progress.time.monotonic", lambda: clock[0])
+    reports = []
+    tracker = ProgressTracker(total_bytes, lambda *report: reports.append(report), interval=1.0, done_bytes=done_bytes)
+    return tracker, reports, clock
+
+
+def test_reports_are_rate_limited_and_smoothed(monkeypatch):
+    tracker, reports, clock = fake_tracker(monkeypatch, 10_000)
+    tracker.add(500)
+    assert reports == []
+    clock[0] += 1.0
+    tracker.add(500)
+    assert reports == [(1000, 10_000, 1000.0, 9)]
+    clock[0] += 1.0
+    tracker.add(2000)
+    rate = 0.3 * 2000 + 0.7 * 1000
+    assert reports[-1] == (3000, 10_000, rate, int(7000 / rate))
+
+
+# A copy that starts again takes its bytes back from the progress, but they were still copied in this window.
+def test_taken_back_bytes_do_not_count_against_the_rate(monkeypatch):
+    tracker, reports, clock = fake_tracker(monkeypatch, 10_000)
+    tracker.add(4000)
+    tracker.add(-4000)
+    assert tracker.done_bytes == 0
+    clock[0] += 2.0
+    tracker.add(1000)
+    assert reports == [(1000, 10_000, 2500.0, 3)]
+
+
+def test_a_resumed_job_starts_with_the_bytes_already_copied(monkeypatch):
+    tracker, reports, clock = fake_tracker(monkeypatch, 10_000, done_bytes=6000)
+    assert tracker.eta() == -1
+    clock[0] += 4.0
+    tracker.finish()
+    assert reports == [(6000, 10_000, 0.0, 0)]
+    tracker.rate = 0
+    tracker.add(2000)
+    tracker.finish()
+    assert reports[-1] == (8000, 10_000, 500.0, 0)
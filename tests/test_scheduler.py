@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+import pytest
+import app.copyengine
+from app.scheduler import JobScheduler, QUEUED, RUNNING, PAUSED, COMPLETED, CANCELLED
+
+
+# Every path gets the device named by its first directory, so /card1/... and /raid/... are different devices.
+@pytest.fixture(autouse=True)
+def fake_devices(monkeypatch):
+    monkeypatch.setattr(app.copyengine, "device_id", lambda path: path.strip("/").split("/")[0])
+
+
+def add(scheduler, import_path, *export_paths):
+    return scheduler.add(SimpleNamespace(import_path=import_path, export_paths=list(export_paths)))
+
+
+def started_ids(scheduler):
+    return [queued.id for queued in scheduler.start_runnable()]
+
+
+def test_one_job_per_source_device():
+    scheduler = JobScheduler(max_jobs=4, jobs_per_source=1, jobs_per_dest=4)
+    first = add(scheduler, "/card1/DCIM", "/raid/a")
+    second = add(scheduler, "/card1/DCIM", "/raid/b")
+    third = add(scheduler, "/card2/DCIM", "/raid/c")
+    assert started_ids(scheduler) == [first.id, third.id]
+    assert second.state == QUEUED
+    scheduler.finish(first.id, COMPLETED)
+    assert started_ids(scheduler) == [second.id]
+
+
+def test_destination_device_limit():
+    scheduler = JobScheduler(max_jobs=4, jobs_per_source=4, jobs_per_dest=1)
+    first = add(scheduler, "/card1/DCIM", "/raid/a", "/backup/a")
+    second = add(scheduler, "/card2/DCIM", "/backup/b")
+    third = add(scheduler, "/card3/DCIM", "/nas/c")
+    assert started_ids(scheduler) == [first.id, third.id]
+    scheduler.finish(first.id, COMPLETED)
+    assert started_ids(scheduler) == [second.id]
+
+
+def test_jobs_exporting_to_the_same_directory_never_overlap():
+    scheduler = JobScheduler(max_jobs=4, jobs_per_source=4, jobs_per_dest=4)
+    first = add(scheduler, "/card1/DCIM", "/raid/project")
+    second = add(scheduler, "/card2/DCIM", "/raid/project/")
+    assert started_ids(scheduler) == [first.id]
+    scheduler.finish(first.id, COMPLETED)
+    assert started_ids(scheduler) == [second.id]
+    scheduler.finish(second.id, COMPLETED)
+    assert scheduler.idle()
+
+
+def test_the_job_limit_and_queue_order():
+    scheduler = JobScheduler(max_jobs=1, jobs_per_source=4, jobs_per_dest=4)
+    first = add(scheduler, "/card1/DCIM", "/raid/a")
+    second = add(scheduler, "/card2/DCIM", "/raid/b")
+    scheduler.move(second.id, -1)
+    assert started_ids(scheduler) == [second.id]
+    assert started_ids(scheduler) == []
+    scheduler.finish(second.id, COMPLETED)
+    assert started_ids(scheduler) == [first.id]
+
+
+# A paused running job keeps its devices; a paused queued job is skipped until it is resumed.
+def test_paused_jobs():
+    scheduler = JobScheduler(max_jobs=4, jobs_per_source=1, jobs_per_dest=4)
+    running = add(scheduler, "/card1/DCIM", "/raid/a")
+    waiting = add(scheduler, "/card1/DCIM", "/raid/b")
+    held = add(scheduler, "/card2/DCIM", "/raid/c")
+    scheduler.pause(held.id)
+    assert started_ids(scheduler) == [running.id]
+    scheduler.pause(running.id)
+    assert running.state == PAUSED and running.control.paused
+    assert started_ids(scheduler) == []
+    scheduler.resume(running.id)
+    scheduler.resume(held.id)
+    assert running.state == RUNNING and not running.control.paused
+    assert started_ids(scheduler) == [held.id]
+    assert waiting.state == QUEUED
+
+
+def test_cancelling_queued_and_running_jobs():
+    scheduler = JobScheduler(max_jobs=1)
+    running = add(scheduler, "/card1/DCIM", "/raid/a")
+    queued = add(scheduler, "/card2/DCIM", "/raid/b")
+    started_ids(scheduler)
+    scheduler.cancel(queued.id)
+    scheduler.cancel(running.id)
+    assert queued.state == CANCELLED
+    assert running.state == RUNNING and running.control.cancelled
+    scheduler.finish(running.id, CANCELLED)
+    assert scheduler.idle() and started_ids(scheduler) == []